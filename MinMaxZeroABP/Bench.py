@@ -0,0 +1,155 @@
+# Bench.py - fixed search positions and node counts for comparing search changes
+#
+#   python Bench.py                         depth 5 on the middlegame suite: the defaults, then every
+#                                           Searcher.use* switch flipped in turn
+#   python Bench.py 4 --suite tactics       another suite or depth
+#   python Bench.py --switch useNullMove    only the defaults and this switch flipped
+#   python Bench.py --suite game --set counterMoveBonus=0 continuationWeight=0
+#                                           replay the recorded games with other Searcher settings
+#
+# Node counts do not depend on the machine, so they are what pruning and ordering changes are judged by;
+# times are only comparable between runs on the same machine.
+
+import argparse
+import ast
+import time
+
+import ChessEngine
+import MinMaxAI
+import Perft
+
+# Each suite is a list of (fen, expected best move or None); the expected move is a getChessNotation prefix
+SUITES = {
+    'middlegame': [
+        (ChessEngine.START_FEN, None),
+        ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", None),  # Kiwipete
+        ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", None),
+        ("r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 b - - 0 10", None),
+    ],
+    'tactics': [
+        ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", "Qxf7"),  # mate
+        ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", "Rd8"),  # back rank mate
+        ("r3k3/8/8/1N6/8/8/8/4K3 w - - 0 1", "Nc7"),  # fork
+        ("6k1/5ppp/8/8/8/8/r4PPP/1R4K1 b - - 0 1", None),
+        ("r1bqk2r/pppp1ppp/2n5/2b1p3/2B1n3/2N2N2/PPPP1PPP/R1BQK2R w KQkq - 0 5", None),
+        ("rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq - 0 2", "Qh4"),  # mate
+        ("rnbqkbnr/ppp2ppp/8/3pp3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 3", None),
+        ("2kr3r/ppp2ppp/2n5/2b1q3/4P3/2N5/PPP2PPP/R1BQ1RK1 b - - 0 12", None),
+    ],
+    'mixed': [
+        (ChessEngine.START_FEN, None),
+        ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", None),
+        ("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", None),
+        ("r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 b - - 0 10", None),
+        ("r1bqk2r/pppp1ppp/2n5/2b1p3/2B1n3/2N2N2/PPPP1PPP/R1BQK2R w KQkq - 0 5", None),
+        ("rnbqkbnr/ppp2ppp/8/3pp3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 0 3", None),
+        ("2kr3r/ppp2ppp/2n5/2b1q3/4P3/2N5/PPP2PPP/R1BQ1RK1 b - - 0 12", None),
+        ("r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQ1RK1 w - - 0 7", None),
+        ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", None),
+        ("2rq1rk1/pp1bppbp/2np1np1/8/3NP3/1BN1BP2/PPPQ2PP/2KR3R b - - 0 11", None),
+    ],
+}
+
+# Two 40-ply games recorded with a depth 3 Searcher, 80 positions in all. One Searcher plays through each game,
+# so killers and history carry over between moves as in ChessMain: the suite for ordering table changes.
+GAMES = [
+    (ChessEngine.START_FEN,
+     "e2e4 e7e5 d2d4 b8c6 g1f3 e5d4 f3d4 d7d5 d4c6 b7c6 b1c3 d5d4 c3e2 f8b4 c2c3 d4c3 d1d8 e8d8 b2c3 b4d6 "
+     "e2d4 g8e7 f1c4 c6c5 d4b5 c8e6 b5d6 c7d6 c4e6 f7e6 e1e2 d8d7 e2d3 a8b8 c1e3 e6e5 a1b1 d7e6 c3c4 h8f8"),
+    ("r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 b - - 0 10",
+     "d8c7 d1b3 f6g4 h2h3 g4f6 a2a3 e7d6 f1e1 c7b6 b3b6 a7b6 c3b5 d6e7 b5c3 f8e8 e3e4 d5e4 c3e4 f6e4 e1e4 "
+     "e7d6 a1c1 a8a5 e4e1 e8d8 e1e4 d8e8 g1f1 f7f5 e4h4 d6e7 h4h5 e8d8 c1e1 g8f7 h5h7 c6d4 f3d4 d8d4 e1d1"),
+]
+
+
+def searchSwitches():
+    # Every on/off technique switch of a Searcher, e.g. useNullMove
+    return [name for name, value in vars(MinMaxAI.Searcher()).items()
+            if name.startswith('use') and isinstance(value, bool)]
+
+
+def newSearcher(settings):
+    searcher = MinMaxAI.Searcher()
+    for name, value in settings.items():
+        setattr(searcher, name, value)
+    return searcher
+
+
+def runSuite(positions, depth, settings):
+    # Returns ([nodes per search], [best move per search], mismatches against the expected moves)
+    nodes, moves, mismatches = [], [], 0
+    for fen, expected in positions:
+        gs = ChessEngine.newGameState(fen)
+        searcher = newSearcher(settings)
+        move = searcher.findBestMove(gs, gs.getValidMoves(), maxDepth=depth)
+        notation = move.getChessNotation(gs) if move is not None else '-'
+        if expected is not None and not notation.startswith(expected):
+            mismatches += 1
+            notation += '(!)'
+        nodes.append(searcher.nodes)
+        moves.append(notation)
+    return nodes, moves, mismatches
+
+
+def runGames(depth, settings):
+    # Searches every position of GAMES, then plays the recorded move; returns ([nodes per search], [], 0)
+    nodes = []
+    for fen, moveText in GAMES:
+        gs = ChessEngine.newGameState(fen)
+        searcher = newSearcher(settings)
+        for text in moveText.split():
+            searcher.findBestMove(gs, gs.getValidMoves(), maxDepth=depth)
+            nodes.append(searcher.nodes)
+            gs.makeMove(Perft.findMove(gs, text))
+    return nodes, [], 0
+
+
+def parseSettings(parser, assignments):
+    # ['counterMoveBonus=0', ...] -> {'counterMoveBonus': 0, ...}, checked against the Searcher's attributes
+    known = vars(MinMaxAI.Searcher())
+    settings = {}
+    for assignment in assignments:
+        name, _, text = assignment.partition('=')
+        if name not in known or not text:
+            parser.error(f"--set expects NAME=VALUE with a Searcher attribute, not '{assignment}'")
+        try:
+            settings[name] = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            parser.error(f"Bad value in '{assignment}'")
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search fixed positions and print the nodes every search takes.")
+    parser.add_argument('depth', type=int, nargs='?', default=5)
+    parser.add_argument('--suite', default='middlegame', choices=sorted(SUITES) + ['game'])
+    parser.add_argument('--switch', action='append', choices=searchSwitches(),
+                        help="flip only this switch (repeatable); default: every switch")
+    parser.add_argument('--set', nargs='+', default=[], metavar='NAME=VALUE',
+                        help="Searcher settings for every run, e.g. counterMoveBonus=0")
+    args = parser.parse_args()
+
+    baseSettings = parseSettings(parser, args.set)
+    defaults = vars(MinMaxAI.Searcher())
+    runs = [('defaults', baseSettings)]
+    for name in args.switch or searchSwitches():
+        value = not baseSettings.get(name, defaults[name])
+        runs.append((f"{name}={value}", dict(baseSettings, **{name: value})))
+
+    print(f"Suite {args.suite}, depth {args.depth}"
+          + (f", {' '.join(args.set)}" if args.set else ""))
+    for label, settings in runs:
+        startTime = time.perf_counter()
+        if args.suite == 'game':
+            nodes, moves, mismatches = runGames(args.depth, settings)
+        else:
+            nodes, moves, mismatches = runSuite(SUITES[args.suite], args.depth, settings)
+        elapsed = time.perf_counter() - startTime
+        print(f"{label:<34} {sum(nodes):>9} nodes  {elapsed:7.1f}s"
+              + (f"  {mismatches} wrong" if mismatches else ""))
+        if args.suite != 'game':
+            print("    " + "  ".join(f"{count} {move}" for count, move in zip(nodes, moves)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,74 @@
+import random
+
+import Trace
+
+# --- Zobrist keys ---
+# One random 64-bit number per (piece, square), side to move, castling state and en passant file.
+# XOR-ing them together gives a position key that makeMove/undoMove can update in O(1).
+_zobristRandom = random.Random(20250616)
+ZOBRIST_PIECES = {color + pieceType: [_zobristRandom.getrandbits(64) for _ in range(64)]
+                  for color in 'wb' for pieceType in 'pNBRQK'}
+ZOBRIST_BLACK_TO_MOVE = _zobristRandom.getrandbits(64)
+ZOBRIST_CASTLING = [_zobristRandom.getrandbits(64) for _ in range(16)]
+ZOBRIST_ENPASSANT = [_zobristRandom.getrandbits(64) for _ in range(8)]  # indexed by file
+# --- End Zobrist keys ---
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Castling rights are one int of these bits (the layout CastleRights.asIndex returns)
+CASTLE_WHITE_KING, CASTLE_BLACK_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_QUEEN = 1, 2, 4, 8
+CASTLE_ALL = 15
+# makeMove ANDs the rights with the masks of the from- and to-square: moving a king or rook off its home square,
+# or capturing on a rook's home square, clears the matching bits
+CASTLING_MASK = [CASTLE_ALL] * 64
+CASTLING_MASK[0] = CASTLE_ALL & ~CASTLE_BLACK_QUEEN  # a8
+CASTLING_MASK[4] = CASTLE_ALL & ~(CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN)  # e8
+CASTLING_MASK[7] = CASTLE_ALL & ~CASTLE_BLACK_KING  # h8
+CASTLING_MASK[56] = CASTLE_ALL & ~CASTLE_WHITE_QUEEN  # a1
+CASTLING_MASK[60] = CASTLE_ALL & ~(CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN)  # e1
+CASTLING_MASK[63] = CASTLE_ALL & ~CASTLE_WHITE_KING  # h1
+CASTLING_HOME_PIECES = {0: 'bR', 4: 'bK', 7: 'bR', 56: 'wR', 60: 'wK', 63: 'wR'}  # Pieces the rights above need
+
+# makeMove saves what undoMove cannot rebuild from the Move itself in GameState.undoStack, a flat list holding one
+# record per ply: captured piece, castling rights index, en passant square, halfmove clock and Zobrist key
+UNDO_RECORD_SIZE = 5
+UNDO_STACK_PLIES = 512  # Initial capacity; makeMove doubles the stack if a game runs longer
+
+# Move kinds for generateMoves: captures includes promotions and en passant, quiets is everything else
+GEN_ALL, GEN_CAPTURES, GEN_QUIETS = 0, 1, 2
+MVV_LVA_VALUES = {'p': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0}
+# Static exchange evaluation piece values, on the same scale as MinMaxAI.pieceScore
+SEE_VALUES = {'p': 100, 'N': 300, 'B': 325, 'R': 500, 'Q': 900, 'K': 20000}
+SEE_ORDER = ('p', 'N', 'B', 'R', 'Q', 'K')  # cheapest attacker first
+
+
+# MVV_LVA_TABLE[victimType][attackerType]; victim '-' is the empty square of a non-capture
+MVV_LVA_TABLE = {victim: {attacker: 10 * MVV_LVA_VALUES.get(victim, 0) - MVV_LVA_VALUES[attacker]
+                          for attacker in MVV_LVA_VALUES}
+                 for victim in list(MVV_LVA_VALUES) + ['-']}
+
+
+def mvvLvaScore(move):
+    # Most valuable victim first, least valuable attacker as the tie break; a promotion counts as winning a queen
+    score = MVV_LVA_TABLE[move.pieceCaptured[1]][move.pieceMoved[1]]
+    if move.isPawnPromotion:
+        score += 10 * MVV_LVA_VALUES['Q']
+    return score
+
+
+def pickBest(moves, scores):
+    # Yields moves from the highest score down, selecting each one only when the caller asks for it, so a
+    # cutoff after the first few moves never pays for sorting the rest. Both lists are consumed.
+    while moves:
+        best = scores.index(max(scores))
+        move = moves[best]
+        moves[best] = moves[-1]
+        scores[best] = scores[-1]
+        moves.pop()
+        scores.pop()
+        yield move
+
+
 class GameState():
     def __init__(self):
         # 8x8 board, 2d list with 2 letter element in it representing color and type
@@ -22,31 +93,165 @@ class GameState():
         self.blackKingLocation = (0, 4)
 
         self.inCheck = False  # Is the current player in check? Set by getValidMoves.
-        self.pins = []  # List of pinned pieces for the current player.
+        self.pins = {}  # Pinned (row, col) -> squares it may still move to, for the current player
+        self.checkTargets = None  # In single check: the squares that capture the checker or block it
         self.checks = []  # List of checks against the current player's king.
 
         self.enpassantPossible = ()
-        self.enpassantPossibleLog = [()]  # Log to correctly undo enpassant states
-
-        self.currentCastlingRight = CastleRights(True, True, True, True)
-        self.castleRightsLog = [
-            CastleRights(self.currentCastlingRight.whiteKingSide, self.currentCastlingRight.blackKingSide,
-                         self.currentCastlingRight.whiteQueenSide, self.currentCastlingRight.blackQueenSide)]
+        self.castlingRights = CASTLE_ALL
 
         self.checkmate = False
         self.stalemate = False  # This flag will be used for stalemate and other draw conditions
         self.halfmoveClock = 0
-        self.halfmoveClockLog = [0]
+        self.undoStack = [None] * (UNDO_RECORD_SIZE * UNDO_STACK_PLIES)
+        self.nullMoveStack = []  # (enpassantPossible, zobristKey, len(moveLog)) saved by makeNullMove
+        self.startFullmoveNumber = 1  # FEN move number of the position before moveLog[0]
+        self.startWhiteToMove = True
+        self.initPieceLists()
+        self.zobristKey = self.computeZobristKey()
+        self.positionHistory = {}  # Zobrist key -> how many times the position has occurred
+        self.updatePositionHistory()
+
+    @classmethod
+    def from_fen(cls, fen):
+        gs = cls()
+        gs.loadFen(fen)
+        return gs
+
+    def loadFen(self, fen):
+        # Replaces the whole position; the logs restart here so undoMove stops at this position
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: '{fen}'")
+        placement, side, castling, enpassant = fields[:4]
+        halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+        fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+
+        rows = placement.split('/')
+        if len(rows) != 8:
+            raise ValueError(f"FEN board needs 8 ranks: '{placement}'")
+        board = []
+        kings = {'w': [], 'b': []}
+        for r, rowText in enumerate(rows):
+            row = []
+            for ch in rowText:
+                if ch.isdigit():
+                    row.extend(['--'] * int(ch))
+                elif ch.lower() in 'pnbrqk':
+                    color = 'w' if ch.isupper() else 'b'
+                    pieceType = 'p' if ch.lower() == 'p' else ch.upper()
+                    if pieceType == 'K':
+                        kings[color].append((r, len(row)))
+                    elif pieceType == 'p' and r in (0, 7):
+                        raise ValueError(f"FEN has a pawn on the first or last rank: '{placement}'")
+                    row.append(color + pieceType)
+                else:
+                    raise ValueError(f"Bad FEN piece '{ch}' in '{placement}'")
+            if len(row) != 8:
+                raise ValueError(f"FEN rank '{rowText}' does not have 8 squares")
+            board.append(row)
+        if len(kings['w']) != 1 or len(kings['b']) != 1:
+            raise ValueError(f"FEN board needs exactly one king per side: '{placement}'")
+        if side not in ('w', 'b'):
+            raise ValueError(f"FEN side to move must be 'w' or 'b', not '{side}'")
+        if enpassant != '-' and (len(enpassant) != 2 or enpassant[0] not in Move.filesToCols or
+                                 enpassant[1] != ('6' if side == 'w' else '3')):
+            raise ValueError(f"Bad FEN en passant square '{enpassant}'")
+
+        # A right only counts while its king and rook are still on their home squares
+        castlingRights = ('K' in castling) * CASTLE_WHITE_KING | ('k' in castling) * CASTLE_BLACK_KING | \
+                         ('Q' in castling) * CASTLE_WHITE_QUEEN | ('q' in castling) * CASTLE_BLACK_QUEEN
+        for sq, piece in CASTLING_HOME_PIECES.items():
+            if board[sq // 8][sq % 8] != piece:
+                castlingRights &= CASTLING_MASK[sq]
+
+        self.board = board
+        self.whiteKingLocation, self.blackKingLocation = kings['w'][0], kings['b'][0]
+        self.whiteToMove = side == 'w'
+        self.moveLog = []
+        self.nullMoveStack = []
+        self.castlingRights = castlingRights
+        if enpassant == '-':
+            self.enpassantPossible = ()
+        else:
+            self.enpassantPossible = (Move.ranksToRows[enpassant[1]], Move.filesToCols[enpassant[0]])
+        self.halfmoveClock = halfmoveClock
+        self.startFullmoveNumber = fullmoveNumber
+        self.startWhiteToMove = self.whiteToMove
+        self.inCheck = False
+        self.pins = {}
+        self.checks = []
+        self.checkTargets = None
+        self.checkmate = False
+        self.stalemate = False
+        self.initPieceLists()
+        self.zobristKey = self.computeZobristKey()
         self.positionHistory = {}
         self.updatePositionHistory()
 
+    def to_fen(self):
+        rows = []
+        for row in self.board:
+            rowText = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rowText += str(empty)
+                    empty = 0
+                letter = 'P' if piece[1] == 'p' else piece[1]
+                rowText += letter if piece[0] == 'w' else letter.lower()
+            if empty:
+                rowText += str(empty)
+            rows.append(rowText)
+
+        castling = ''
+        for bit, letter in ((CASTLE_WHITE_KING, 'K'), (CASTLE_WHITE_QUEEN, 'Q'),
+                            (CASTLE_BLACK_KING, 'k'), (CASTLE_BLACK_QUEEN, 'q')):
+            if self.castlingRights & bit: castling += letter
+
+        if self.enpassantPossible:
+            enpassant = Move.colsToFiles[self.enpassantPossible[1]] + Move.rowsToRanks[self.enpassantPossible[0]]
+        else:
+            enpassant = '-'
+
+        fullmoveNumber = self.gamePly() // 2 + 1
+        return f"{'/'.join(rows)} {'w' if self.whiteToMove else 'b'} {castling or '-'} {enpassant} " \
+               f"{self.halfmoveClock} {fullmoveNumber}"
+
+    def initPieceLists(self):
+        # pieceLists[color][pieceType] is the set of (row, col) squares holding that piece,
+        # kept in step with the board by makeMove/undoMove so nobody has to scan all 64 squares
+        self.pieceLists = {color: {pieceType: set() for pieceType in 'pNBRQK'} for color in 'wb'}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != '--':
+                    self.pieceLists[piece[0]][piece[1]].add((r, c))
+
+    def computeZobristKey(self):
+        # Full recompute; makeMove/undoMove keep self.zobristKey up to date incrementally
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != '--':
+                    key ^= ZOBRIST_PIECES[piece][r * 8 + c]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castlingRights]
+        if self.enpassantPossible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        return key
+
+    def gamePly(self):
+        # Plies played since the initial position, counting the moves before a loaded FEN
+        return 2 * (self.startFullmoveNumber - 1) + (0 if self.startWhiteToMove else 1) + len(self.moveLog)
+
     def getPositionHash(self):
-        return (
-            tuple(map(tuple, self.board)),
-            self.whiteToMove,
-            self.currentCastlingRight.astuple(),
-            self.enpassantPossible
-        )
+        return self.zobristKey
 
     def updatePositionHistory(self):
         pos_hash = self.getPositionHash()
@@ -62,19 +267,11 @@ class GameState():
     def is_insufficient_material(self):
         pieceCounts = {'w': {'Q': 0, 'R': 0, 'B': 0, 'N': 0, 'p': 0},
                        'b': {'Q': 0, 'R': 0, 'B': 0, 'N': 0, 'p': 0}}
-        b_bishop_colors = []
-        w_bishop_colors = []
-        for r in range(8):
-            for c in range(8):
-                piece_str = self.board[r][c]
-                if piece_str != '--':
-                    color, piece_type = piece_str[0], piece_str[1]
-                    if piece_type != 'K': pieceCounts[color][piece_type] += 1
-                    if piece_type == 'B':
-                        if color == 'w':
-                            w_bishop_colors.append((r + c) % 2)
-                        else:
-                            b_bishop_colors.append((r + c) % 2)
+        for color in 'wb':
+            for piece_type in pieceCounts[color]:
+                pieceCounts[color][piece_type] = len(self.pieceLists[color][piece_type])
+        w_bishop_colors = [(r + c) % 2 for r, c in self.pieceLists['w']['B']]
+        b_bishop_colors = [(r + c) % 2 for r, c in self.pieceLists['b']['B']]
         if any(pieceCounts[color]['p'] > 0 for color in 'wb') or \
                 any(pieceCounts[color]['Q'] > 0 for color in 'wb') or \
                 any(pieceCounts[color]['R'] > 0 for color in 'wb'): return False
@@ -100,7 +297,23 @@ class GameState():
     def is_fifty_move_rule(self):
         return self.halfmoveClock >= 100
 
+    def isDrawByRule(self):
+        # The draws updateGameOverFlags reports while moves remain, for callers that skip full generation
+        return self.is_fifty_move_rule() or self.is_threefold_repetition() or self.is_insufficient_material()
+
     def makeMove(self, move):
+        previousCastleIndex = self.castlingRights
+        previousEnpassant = self.enpassantPossible
+        undoStack = self.undoStack
+        base = len(self.moveLog) * UNDO_RECORD_SIZE
+        if base == len(undoStack):
+            undoStack.extend([None] * len(undoStack))
+        undoStack[base] = move.pieceCaptured
+        undoStack[base + 1] = previousCastleIndex
+        undoStack[base + 2] = previousEnpassant
+        undoStack[base + 3] = self.halfmoveClock
+        undoStack[base + 4] = self.zobristKey
+
         self.board[move.startRow][move.startCol] = "--"
         self.board[move.endRow][move.endCol] = move.pieceMoved
         self.moveLog.append(move)
@@ -118,7 +331,6 @@ class GameState():
             self.enpassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
         else:
             self.enpassantPossible = ()
-        self.enpassantPossibleLog.append(self.enpassantPossible)
 
         if move.isCastleMove:
             if move.endCol - move.startCol == 2:  # king side
@@ -128,16 +340,15 @@ class GameState():
                 self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]
                 self.board[move.endRow][move.endCol - 2] = '--'
 
-        self.updateCastleRight(move)
-        self.castleRightsLog.append(
-            CastleRights(self.currentCastlingRight.whiteKingSide, self.currentCastlingRight.blackKingSide,
-                         self.currentCastlingRight.whiteQueenSide, self.currentCastlingRight.blackQueenSide))
+        self.movePieceLists(move)
+        self.castlingRights &= CASTLING_MASK[move.startRow * 8 + move.startCol] & \
+            CASTLING_MASK[move.endRow * 8 + move.endCol]
 
         if move.pieceMoved[1] == 'p' or move.pieceCaptured != '--':
             self.halfmoveClock = 0
         else:
             self.halfmoveClock += 1
-        self.halfmoveClockLog.append(self.halfmoveClock)
+        self.updateZobristKey(move, previousCastleIndex, previousEnpassant)
         self.updatePositionHistory()
         self.checkmate = False
         self.stalemate = False
@@ -147,8 +358,16 @@ class GameState():
         if len(self.moveLog) != 0:
             self.unUpdatePositionHistory()  # Corrected: must un-update for current state before popping move
             move = self.moveLog.pop()
+            undoStack = self.undoStack
+            base = len(self.moveLog) * UNDO_RECORD_SIZE
+            pieceCaptured = undoStack[base]
+
             self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            if move.isEnpassantMove:  # the captured pawn stood beside the start square, not on the end square
+                self.board[move.endRow][move.endCol] = '--'
+                self.board[move.startRow][move.endCol] = pieceCaptured
+            else:
+                self.board[move.endRow][move.endCol] = pieceCaptured
             self.whiteToMove = not self.whiteToMove
 
             if move.pieceMoved == 'wK':
@@ -156,19 +375,6 @@ class GameState():
             elif move.pieceMoved == 'bK':
                 self.blackKingLocation = (move.startRow, move.startCol)
 
-            self.enpassantPossibleLog.pop()  # Remove current EP state from log
-            self.enpassantPossible = self.enpassantPossibleLog[-1]  # Restore previous EP state
-
-            if move.isEnpassantMove:
-                self.board[move.endRow][move.endCol] = '--'  # Captured pawn was on endRow, endCol conceptually
-                self.board[move.startRow][move.endCol] = move.pieceCaptured  # Restore the captured pawn
-                # The self.enpassantPossible is already restored from the log to state *before* this EP move.
-
-            self.castleRightsLog.pop()
-            prev_rights = self.castleRightsLog[-1]
-            self.currentCastlingRight = CastleRights(prev_rights.whiteKingSide, prev_rights.blackKingSide,
-                                                     prev_rights.whiteQueenSide, prev_rights.blackQueenSide)
-
             if move.isCastleMove:
                 if move.endCol - move.startCol == 2:  # king side
                     self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 1]
@@ -177,296 +383,462 @@ class GameState():
                     self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]
                     self.board[move.endRow][move.endCol + 1] = '--'
 
-            self.halfmoveClockLog.pop()
-            self.halfmoveClock = self.halfmoveClockLog[-1]
+            self.movePieceLists(move, undo=True)
+
+            self.castlingRights = undoStack[base + 1]
+            self.enpassantPossible = undoStack[base + 2]
+            self.halfmoveClock = undoStack[base + 3]
+            self.zobristKey = undoStack[base + 4]
             self.checkmate = False
             self.stalemate = False
 
-    def updateCastleRight(self, move):
-        if move.pieceMoved == 'wK':
-            self.currentCastlingRight.whiteKingSide = False
-            self.currentCastlingRight.whiteQueenSide = False
-        elif move.pieceMoved == 'bK':
-            self.currentCastlingRight.blackKingSide = False
-            self.currentCastlingRight.blackQueenSide = False
-
-        if move.pieceMoved == 'wR':
-            if move.startRow == 7 and move.startCol == 0:
-                self.currentCastlingRight.whiteQueenSide = False
-            elif move.startRow == 7 and move.startCol == 7:
-                self.currentCastlingRight.whiteKingSide = False
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0 and move.startCol == 0:
-                self.currentCastlingRight.blackQueenSide = False
-            elif move.startRow == 0 and move.startCol == 7:
-                self.currentCastlingRight.blackKingSide = False
-        #Missing Rooks
-        if move.pieceCaptured == 'wR':
-            if move.endRow == 7 and move.endCol == 0:
-                self.currentCastlingRight.whiteQueenSide = False
-            elif move.endRow == 7 and move.endCol == 7:
-                self.currentCastlingRight.whiteKingSide = False
-        elif move.pieceCaptured == 'bR':
-            if move.endRow == 0 and move.endCol == 0:
-                self.currentCastlingRight.blackQueenSide = False
-            elif move.endRow == 0 and move.endCol == 7:
-                self.currentCastlingRight.blackKingSide = False
+    def makeNullMove(self):
+        # Pass the turn for null-move pruning: board, move log and position history stay as they are
+        self.nullMoveStack.append((self.enpassantPossible, self.zobristKey, len(self.moveLog)))
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self.zobristKey = key
+        self.enpassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+
+    def undoNullMove(self):
+        self.enpassantPossible, self.zobristKey, _ = self.nullMoveStack.pop()
+        self.whiteToMove = not self.whiteToMove
+
+    def undoToPly(self, ply):
+        # Undo real and null moves, newest first, until ply moves are left and no null move is pending.
+        # The order matters: undoMove removes the current zobristKey from the position history.
+        nullMoveStack = self.nullMoveStack
+        while nullMoveStack or len(self.moveLog) > ply:
+            if nullMoveStack and nullMoveStack[-1][2] == len(self.moveLog):
+                self.undoNullMove()
+            else:
+                self.undoMove()
+
+    def movePieceLists(self, move, undo=False):
+        # Same bookkeeping as the board for makeMove (undo=False) or undoMove (undo=True)
+        start, end = (move.startRow, move.startCol), (move.endRow, move.endCol)
+        own = self.pieceLists[move.pieceMoved[0]]
+        endType = 'Q' if move.isPawnPromotion else move.pieceMoved[1]
+        if undo:
+            own[endType].remove(end)
+            own[move.pieceMoved[1]].add(start)
+        else:
+            own[move.pieceMoved[1]].remove(start)
+            own[endType].add(end)
+        if move.pieceCaptured != '--':
+            capturedSq = (move.startRow, move.endCol) if move.isEnpassantMove else end
+            enemySquares = self.pieceLists[move.pieceCaptured[0]][move.pieceCaptured[1]]
+            if undo:
+                enemySquares.add(capturedSq)
+            else:
+                enemySquares.remove(capturedSq)
+        if move.isCastleMove:
+            if move.endCol - move.startCol == 2:  # king side
+                rookFrom, rookTo = (move.endRow, 7), (move.endRow, 5)
+            else:  # queen side
+                rookFrom, rookTo = (move.endRow, 0), (move.endRow, 3)
+            if undo:
+                rookFrom, rookTo = rookTo, rookFrom
+            own['R'].remove(rookFrom)
+            own['R'].add(rookTo)
+
+    def updateZobristKey(self, move, previousCastleIndex, previousEnpassant):
+        # Called by makeMove after the board, castling rights and en passant square have been updated
+        key = self.zobristKey ^ ZOBRIST_BLACK_TO_MOVE
+        startSq = move.startRow * 8 + move.startCol
+        endSq = move.endRow * 8 + move.endCol
+        key ^= ZOBRIST_PIECES[move.pieceMoved][startSq]
+        key ^= ZOBRIST_PIECES[self.board[move.endRow][move.endCol]][endSq]  # the queen after a promotion
+        if move.pieceCaptured != '--':
+            capturedSq = move.startRow * 8 + move.endCol if move.isEnpassantMove else endSq
+            key ^= ZOBRIST_PIECES[move.pieceCaptured][capturedSq]
+        if move.isCastleMove:
+            rook = move.pieceMoved[0] + 'R'
+            if move.endCol - move.startCol == 2:  # king side
+                key ^= ZOBRIST_PIECES[rook][move.endRow * 8 + 7] ^ ZOBRIST_PIECES[rook][move.endRow * 8 + 5]
+            else:  # queen side
+                key ^= ZOBRIST_PIECES[rook][move.endRow * 8] ^ ZOBRIST_PIECES[rook][move.endRow * 8 + 3]
+        key ^= ZOBRIST_CASTLING[previousCastleIndex] ^ ZOBRIST_CASTLING[self.castlingRights]
+        if previousEnpassant:
+            key ^= ZOBRIST_ENPASSANT[previousEnpassant[1]]
+        if self.enpassantPossible:
+            key ^= ZOBRIST_ENPASSANT[self.enpassantPossible[1]]
+        self.zobristKey = key
+
+    @property
+    def currentCastlingRight(self):
+        # Read-only CastleRights view of self.castlingRights for UI code
+        return CastleRights.fromIndex(self.castlingRights)
 
     def getValidMoves(self):
-        tempEnpassantPossible = self.enpassantPossible
-        tempCastleRightsState = CastleRights(self.currentCastlingRight.whiteKingSide,
-                                             self.currentCastlingRight.blackKingSide,
-                                             self.currentCastlingRight.whiteQueenSide,
-                                             self.currentCastlingRight.blackQueenSide)
+        current_valid_moves = self.generateMoves()
+        self.updateGameOverFlags(current_valid_moves)
+        return current_valid_moves
 
+    def generateMoves(self, kind=GEN_ALL, fromSquare=None):
+        # Legal moves of one kind, optionally only those of the piece on fromSquare. Unlike getValidMoves this
+        # leaves the checkmate/stalemate flags alone, so the search can generate in stages.
         self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
-        original_pins_for_this_turn = list(self.pins)  # Make a copy specific to this call
-        current_valid_moves = []
-
         if self.whiteToMove:
             kingRow, kingCol = self.whiteKingLocation
         else:
             kingRow, kingCol = self.blackKingLocation
 
-        if self.inCheck:
-            if len(self.checks) == 1:  # Single check
-                self.pins = list(original_pins_for_this_turn)  # Restore pins for this specific path
-                possible_non_king_moves = self.getAllPossibleMoves()  # Non-king moves
-
-                check = self.checks[0]
-                checkRow, checkCol = check[0], check[1]
-                checking_piece_type = self.board[checkRow][checkCol][1]
-                squares_to_interfere = []
-                if checking_piece_type == 'N':
-                    squares_to_interfere.append((checkRow, checkCol))
-                else:
-                    for i in range(1, 8):
-                        validSquare = (kingRow + check[2] * i, kingCol + check[3] * i)
-                        squares_to_interfere.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol: break
-
-                for m in possible_non_king_moves:
-                    if (m.endRow, m.endCol) in squares_to_interfere:
-                        current_valid_moves.append(m)
-
-                self.pins = list(original_pins_for_this_turn)  # Restore pins for getKingMoves
-                self.getKingMoves(kingRow, kingCol, current_valid_moves)
-            else:  # Double check, only king moves are valid
-                self.pins = list(original_pins_for_this_turn)  # Restore pins for getKingMoves
-                self.getKingMoves(kingRow, kingCol, current_valid_moves)
-            # No castling if in check (handled by getCastleMove's self.inCheck check)
-        else:  # Not in check
-            self.pins = list(original_pins_for_this_turn)  # Use fresh copy of pins for getAllPossibleMoves
-            current_valid_moves = self.getAllPossibleMoves()  # Generates non-king moves
-
-            self.pins = list(original_pins_for_this_turn)  # Use fresh copy of pins for getKingMoves
-            self.getKingMoves(kingRow, kingCol, current_valid_moves)
-
-            # Add castle moves (getCastleMove will check rights, king position, and attacked squares)
-            # self.inCheck is False here.
-            if self.whiteToMove:
-                self.getCastleMove(self.whiteKingLocation[0], self.whiteKingLocation[1], current_valid_moves)
+        moves = []
+        if len(self.checks) < 2 and fromSquare != (kingRow, kingCol):  # In double check only the king moves
+            self.checkTargets = self.getCheckTargets(kingRow, kingCol) if self.inCheck else None
+            if fromSquare is None:
+                moves = self.getAllPossibleMoves(kind)  # Generates non-king moves
             else:
-                self.getCastleMove(self.blackKingLocation[0], self.blackKingLocation[1], current_valid_moves)
+                piece = self.board[fromSquare[0]][fromSquare[1]]
+                if piece[0] == ('w' if self.whiteToMove else 'b'):
+                    self.moveFunction[piece[1]](fromSquare[0], fromSquare[1], moves, kind)
+        if fromSquare is None or fromSquare == (kingRow, kingCol):
+            self.getKingMoves(kingRow, kingCol, moves, kind)
+            if not self.inCheck and kind != GEN_CAPTURES:
+                self.getCastleMove(kingRow, kingCol, moves)
+        return moves
+
+    def getCaptureMoves(self):
+        # Legal captures and promotions, most valuable victim first: what quiescence searches
+        captures = self.generateMoves(GEN_CAPTURES)
+        captures.sort(key=mvvLvaScore, reverse=True)
+        return captures
+
+    def getEvasionMoves(self):
+        # Quiescence while in check: every legal reply, captures first. In check the generators already
+        # restrict themselves to king moves, capturing the checker and blocking.
+        evasions = self.generateMoves(GEN_ALL)
+        evasions.sort(key=mvvLvaScore, reverse=True)
+        return evasions
+
+    def staticExchangeEval(self, move):
+        # Material the side to move wins (negative: loses) on move's end square if both sides keep recapturing
+        # with their cheapest attacker. Works from attack lookups only: nothing is moved on the board, a removed
+        # attacker just stops blocking the sliders behind it. Pins are ignored.
+        target = (move.endRow, move.endCol)
+        removed = {(move.startRow, move.startCol)}
+        if move.isEnpassantMove:
+            removed.add((move.startRow, move.endCol))
+            gain = [SEE_VALUES['p']]
+        else:
+            gain = [SEE_VALUES[move.pieceCaptured[1]] if move.pieceCaptured != '--' else 0]
+        onSquare = SEE_VALUES[move.pieceMoved[1]]  # value of the piece the next capture would take
+        if move.isPawnPromotion:
+            gain[0] += SEE_VALUES['Q'] - SEE_VALUES['p']
+            onSquare = SEE_VALUES['Q']
+        color = 'b' if move.pieceMoved[0] == 'w' else 'w'
+        while True:
+            attacker = self.leastValuableAttacker(target, color, removed)
+            if attacker is None:
+                break
+            square, pieceType = attacker
+            gain.append(onSquare - gain[-1])
+            removed.add(square)
+            onSquare = SEE_VALUES[pieceType]
+            color = 'b' if color == 'w' else 'w'
+        # Either side may stop recapturing when that is better for it
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
+    def exchangeLoss(self, move):
+        # SEE of a move that loses material (negative), otherwise 0. Taking a piece worth at least the capturer
+        # never loses material, so SEE is only needed otherwise.
+        if move.pieceCaptured != '--' and not move.isPawnPromotion and \
+                SEE_VALUES[move.pieceCaptured[1]] >= SEE_VALUES[move.pieceMoved[1]]:
+            return 0
+        return min(self.staticExchangeEval(move), 0)
+
+    def isLosingCapture(self, move):
+        return self.exchangeLoss(move) < 0
+
+    def leastValuableAttacker(self, target, color, removed):
+        # ((row, col), pieceType) of color's cheapest piece attacking target, skipping the squares in removed.
+        # Between equal pieces the one on the lowest square index wins. Which one goes first decides which x-ray
+        # opens, so the choice must not depend on the order the rays are scanned in.
+        board = self.board
+        row, col = target
+        sq = row * 8 + col
+        pawns = [(r, c) for r, c in PAWN_ATTACKER_SQUARES[color][sq]
+                 if board[r][c] == color + 'p' and (r, c) not in removed]
+        if pawns:
+            return min(pawns), 'p'
+        knights = [(r, c) for r, c in KNIGHT_SQUARES[sq] if board[r][c] == color + 'N' and (r, c) not in removed]
+        if knights:
+            return min(knights), 'N'
+        sliders = {'B': [], 'R': [], 'Q': []}
+        for sliderType, rays in (('B', BISHOP_RAYS[sq]), ('R', ROOK_RAYS[sq])):
+            for ray in rays:
+                for r, c in ray:
+                    piece = board[r][c]
+                    if piece != '--' and (r, c) not in removed:
+                        if piece[0] == color and (piece[1] == sliderType or piece[1] == 'Q'):
+                            sliders[piece[1]].append((r, c))
+                        break
+        for sliderType in ('B', 'R', 'Q'):
+            if sliders[sliderType]:
+                return min(sliders[sliderType]), sliderType
+        for r, c in KING_SQUARES[sq]:
+            if board[r][c] == color + 'K' and (r, c) not in removed:
+                return (r, c), 'K'
+        return None
+
+    def givesCheck(self, move):
+        # Whether move checks the opponent, from line geometry around the enemy king; nothing is moved.
+        # Covers direct checks by the moved piece (a queen after promotion, the rook when castling) and
+        # discovered checks through the squares the move empties, including an en passant victim's.
+        color = move.pieceMoved[0]
+        kingRow, kingCol = self.blackKingLocation if color == 'w' else self.whiteKingLocation
+        kingSq = kingRow * 8 + kingCol
+        start, end = (move.startRow, move.startCol), (move.endRow, move.endCol)
+        emptied = [start]
+        filled = [end]
+        pieceType = 'Q' if move.isPawnPromotion else move.pieceMoved[1]
+        if move.isEnpassantMove:
+            emptied.append((move.startRow, move.endCol))
+        elif move.isCastleMove:
+            rookCol, rookEndCol = (7, 5) if move.endCol > move.startCol else (0, 3)
+            emptied.append((move.endRow, rookCol))
+            filled.append((move.endRow, rookEndCol))
+            end, pieceType = filled[1], 'R'  # only the rook can give check
+
+        endSq = end[0] * 8 + end[1]
+        if pieceType == 'N':
+            if end in KNIGHT_SQUARES[kingSq]: return True
+        elif pieceType == 'p':
+            if end in PAWN_ATTACKER_SQUARES[color][kingSq]: return True
+        elif pieceType != 'K':
+            line = LINE_RAYS[kingSq][endSq]
+            if line is not None and (pieceType == 'Q' or pieceType == line[1]):
+                board = self.board
+                for square in line[0]:
+                    if square == end:
+                        return True
+                    if square not in emptied and board[square[0]][square[1]] != '--':
+                        break
+
+        # Discovered check: an emptied square was the only thing between the king and one of our sliders
+        for emptySquare in emptied:
+            line = LINE_RAYS[kingSq][emptySquare[0] * 8 + emptySquare[1]]
+            if line is None:
+                continue
+            ray, sliderType = line
+            board = self.board
+            for square in ray:
+                if square in filled:
+                    break
+                if square in emptied:
+                    continue
+                piece = board[square[0]][square[1]]
+                if piece != '--':
+                    if piece[0] == color and (piece[1] == sliderType or piece[1] == 'Q'):
+                        return True
+                    break
+        return False
 
+    def isInCheck(self):
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        return self.isSquareAttacked(kingRow, kingCol, 'b' if self.whiteToMove else 'w')
+
+    def findLegalMove(self, moveID, kind=GEN_ALL):
+        # The legal move with this moveID in the current position, or None (e.g. a stale hash or killer move)
+        startSq = moveID & 63
+        for move in self.generateMoves(kind, (startSq >> 3, startSq & 7)):
+            if move.moveID == moveID:
+                return move
+        return None
+
+    def iter_moves(self, hashMoveID=None, killers=(), scoreQuiet=None):
+        # Staged move generation for the search: the hash move, captures by MVV-LVA, killer moves, captures
+        # that lose material by SEE, then the remaining quiet moves (sorted by scoreQuiet when given). A stage
+        # is only generated once the search asks for a move past the previous one, so a cutoff early on skips
+        # the quiet moves entirely.
+        # Every stage regenerates pins and checks, as the search moves pieces around between two yields.
+        hashMove = self.findLegalMove(hashMoveID) if hashMoveID is not None else None
+        if hashMove is not None:
+            yield hashMove
+
+        captures, scores, losingCaptures = [], [], []
+        for move in self.generateMoves(GEN_CAPTURES):
+            if move.moveID != hashMoveID:
+                if self.isLosingCapture(move):
+                    losingCaptures.append(move)
+                else:
+                    captures.append(move)
+                    scores.append(mvvLvaScore(move))
+        yield from pickBest(captures, scores)
+
+        searchedIDs = {hashMoveID}
+        for killer in killers:
+            if killer is not None and killer.moveID not in searchedIDs:
+                move = self.findLegalMove(killer.moveID, GEN_QUIETS)
+                if move is not None:
+                    searchedIDs.add(move.moveID)
+                    yield move
+
+        for move in losingCaptures:
+            yield move
+
+        quiets = [move for move in self.generateMoves(GEN_QUIETS) if move.moveID not in searchedIDs]
+        if scoreQuiet is None:
+            yield from quiets
+        else:
+            yield from pickBest(quiets, [scoreQuiet(move) for move in quiets])
+
+    def getCheckTargets(self, kingRow, kingCol):
+        # Squares a non-king move may land on to answer a single check: the checker or a square in between
+        checkRow, checkCol, dr, dc = self.checks[0]
+        if self.board[checkRow][checkCol][1] == 'N':
+            return {(checkRow, checkCol)}
+        targets = set()
+        for i in range(1, 8):
+            square = (kingRow + dr * i, kingCol + dc * i)
+            targets.add(square)
+            if square == (checkRow, checkCol): break
+        return targets
+
+    def updateGameOverFlags(self, current_valid_moves):
+        # Sets checkmate/stalemate (and the draw rules) from the generated moves
+        reason = None
         if len(current_valid_moves) == 0:
             if self.inCheck:
                 self.checkmate = True; self.stalemate = False
             else:
-                self.stalemate = True; self.checkmate = False; print("No Move stalemate")
+                self.stalemate = True; self.checkmate = False; reason = "No Move stalemate"
         else:
             self.checkmate = False;
             self.stalemate = False
             if self.is_fifty_move_rule():
-                self.stalemate = True; print("50 move stalemate")
+                self.stalemate = True; reason = "50 move stalemate"
             elif self.is_threefold_repetition():
-                self.stalemate = True; print("Three fold repetition stalemate")
+                self.stalemate = True; reason = "Three fold repetition stalemate"
             elif self.is_insufficient_material():
-                self.stalemate = True; print("Insufficient material stalemate")
-
-        self.enpassantPossible = tempEnpassantPossible
-        self.currentCastlingRight = tempCastleRightsState
-        return current_valid_moves
+                self.stalemate = True; reason = "Insufficient material stalemate"
+        if reason is not None and Trace.levels['draw'] >= Trace.INFO:
+            Trace.emit('draw', reason)
 
-    def getAllPossibleMoves(self):
+    def getAllPossibleMoves(self, kind=GEN_ALL):
         moves = []
-        for row in range(len(self.board)):  # Renamed r to r_idx
-            for colum in range(len(self.board[row])):  # Renamed c to c_idx
-                turn = self.board[row][colum][0]
-                if (turn == "w" and self.whiteToMove) or \
-                        (turn == "b" and not self.whiteToMove):
-                    piece_type = self.board[row][colum][1]
-                    if piece_type != 'K':  # FIX 1: Exclude king moves from here
-                        self.moveFunction[piece_type](row, colum, moves)
+        for piece_type, squares in self.pieceLists['w' if self.whiteToMove else 'b'].items():
+            if piece_type != 'K':  # FIX 1: Exclude king moves from here
+                for row, colum in squares:
+                    self.moveFunction[piece_type](row, colum, moves, kind)
         return moves
 
-    def getPawnMoves(self, rows, cols, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):  # Iterate backwards for safe removal
-            if self.pins[i][0] == rows and self.pins[i][1] == cols:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])  # This modifies the current self.pins list
-                break
-        # ... rest of pawn logic (from your original file, seems mostly okay)
+    def getPawnMoves(self, rows, cols, moves, kind=GEN_ALL):
+        pinRay = self.pins.get((rows, cols))  # None, or the squares this pinned pawn may still move to
+        checkTargets = self.checkTargets
         if self.whiteToMove:
-            if rows - 1 >= 0 and self.board[rows - 1][cols] == "--":  # Check boundary for rows-1
-                if not piecePinned or pinDirection == (-1, 0):
-                    moves.append(Move((rows, cols), (rows - 1, cols), self.board))
-                    if rows == 6 and rows - 2 >= 0 and self.board[rows - 2][cols] == "--":  # Check boundary for rows-2
-                        moves.append(Move((rows, cols), (rows - 2, cols), self.board))
-            if cols - 1 >= 0 and rows - 1 >= 0:  # Check boundary for rows-1
-                if self.board[rows - 1][cols - 1][0] == 'b':
-                    if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((rows, cols), (rows - 1, cols - 1), self.board))
-                elif (rows - 1, cols - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, -1):
-                        moves.append(Move((rows, cols), (rows - 1, cols - 1), self.board, isEnpassantMove=True))
-            if cols + 1 <= 7 and rows - 1 >= 0:  # Check boundary for rows-1
-                if self.board[rows - 1][cols + 1][0] == 'b':
-                    if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((rows, cols), (rows - 1, cols + 1), self.board))
-                elif (rows - 1, cols + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (-1, 1):
-                        moves.append(Move((rows, cols), (rows - 1, cols + 1), self.board, isEnpassantMove=True))
-        else:  # Black pawn move
-            if rows + 1 <= 7 and self.board[rows + 1][cols] == "--":  # Check boundary for rows+1
-                if not piecePinned or pinDirection == (1, 0):
-                    moves.append(Move((rows, cols), (rows + 1, cols), self.board))
-                    if rows == 1 and rows + 2 <= 7 and self.board[rows + 2][cols] == "--":  # Check boundary for rows+2
-                        moves.append(Move((rows, cols), (rows + 2, cols), self.board))
-            if cols - 1 >= 0 and rows + 1 <= 7:  # Check boundary for rows+1
-                if self.board[rows + 1][cols - 1][0] == 'w':
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((rows, cols), (rows + 1, cols - 1), self.board))
-                elif (rows + 1, cols - 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, -1):
-                        moves.append(Move((rows, cols), (rows + 1, cols - 1), self.board, isEnpassantMove=True))
-            if cols + 1 <= 7 and rows + 1 <= 7:  # Check boundary for rows+1
-                if self.board[rows + 1][cols + 1][0] == 'w':
-                    if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((rows, cols), (rows + 1, cols + 1), self.board))
-                elif (rows + 1, cols + 1) == self.enpassantPossible:
-                    if not piecePinned or pinDirection == (1, 1):
-                        moves.append(Move((rows, cols), (rows + 1, cols + 1), self.board, isEnpassantMove=True))
-
-    def getRookMoves(self, rows, cols, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == rows and self.pins[i][1] == cols:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                if self.board[rows][cols][1] != 'Q':  # Queen uses rook moves but isn't removed from pin list here
-                    self.pins.remove(self.pins[i])
-                break
-        # ... (rest of logic unchanged)
-        direction = [(-1, 0), (0, 1), (0, -1), (1, 0)]
+            step, startRow, enemyColor = -1, 6, 'b'
+        else:
+            step, startRow, enemyColor = 1, 1, 'w'
+        endRow = rows + step
+        promotes = endRow == 0 or endRow == 7
+        if self.board[endRow][cols] == "--" and kind != (GEN_QUIETS if promotes else GEN_CAPTURES):
+            if pinRay is None or (endRow, cols) in pinRay:
+                if checkTargets is None or (endRow, cols) in checkTargets:
+                    moves.append(Move((rows, cols), (endRow, cols), self.board))
+                if rows == startRow and self.board[endRow + step][cols] == "--" and \
+                        (checkTargets is None or (endRow + step, cols) in checkTargets):
+                    moves.append(Move((rows, cols), (endRow + step, cols), self.board))
+        if kind == GEN_QUIETS:
+            return
+        for endCol in (cols - 1, cols + 1):
+            if not 0 <= endCol < 8 or (pinRay is not None and (endRow, endCol) not in pinRay):
+                continue
+            if self.board[endRow][endCol][0] == enemyColor:
+                if checkTargets is None or (endRow, endCol) in checkTargets:
+                    moves.append(Move((rows, cols), (endRow, endCol), self.board))
+            elif (endRow, endCol) == self.enpassantPossible:
+                # The capture answers a check if it lands in the way or removes the checking pawn
+                if checkTargets is None or (endRow, endCol) in checkTargets or (rows, endCol) in checkTargets:
+                    if not self.enpassantExposesKing(rows, cols, endCol):
+                        moves.append(Move((rows, cols), (endRow, endCol), self.board, isEnpassantMove=True))
+
+    def enpassantExposesKing(self, rows, cols, capturedCol):
+        # Both pawns leave the rank at once, which can open it between the king and an enemy rook or queen
+        kingRow, kingCol = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        if kingRow != rows:
+            return False
         enemyColor = 'b' if self.whiteToMove else 'w'
-        for direct in direction:
-            for i in range(1, 8):
-                endRow = rows + direct[0] * i
-                endCol = cols + direct[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    if not piecePinned or pinDirection == direct or pinDirection == ((-direct[0], -direct[1])):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--":
-                            moves.append(Move((rows, cols), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor:
-                            moves.append(Move((rows, cols), (endRow, endCol), self.board)); break
-                        else:
-                            break
-                else:
-                    break
+        dc = 1 if cols > kingCol else -1
+        c = kingCol + dc
+        while 0 <= c < 8:
+            if c != cols and c != capturedCol:
+                piece = self.board[rows][c]
+                if piece != '--':
+                    return piece[0] == enemyColor and piece[1] in 'RQ'
+            c += dc
+        return False
 
-    def getBishopMoves(self, rows, cols, moves):
-        piecePinned = False
-        pinDirection = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == rows and self.pins[i][1] == cols:
-                piecePinned = True
-                pinDirection = (self.pins[i][2], self.pins[i][3])
-                if self.board[rows][cols][1] == 'B':  # Only remove if actually a Bishop
-                    self.pins.remove(self.pins[i])
-                break
-        # ... (rest of logic unchanged)
-        direction = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-        enemyColor = 'b' if self.whiteToMove else 'w'
-        for d_dir in direction:  # Renamed d to d_dir
-            for i in range(1, 8):
-                endRow = rows + d_dir[0] * i
-                endCol = cols + d_dir[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    if not piecePinned or pinDirection == d_dir or pinDirection == (-d_dir[0], -d_dir[1]):
-                        endPiece = self.board[endRow][endCol]
-                        if endPiece == "--":
-                            moves.append(Move((rows, cols), (endRow, endCol), self.board))
-                        elif endPiece[0] == enemyColor:
-                            moves.append(Move((rows, cols), (endRow, endCol), self.board)); break
-                        else:
-                            break
-                else:
+    def getSlidingMoves(self, rows, cols, rays, moves, kind=GEN_ALL):
+        pinRay = self.pins.get((rows, cols))
+        checkTargets = self.checkTargets
+        allyColor = 'w' if self.whiteToMove else 'b'
+        for ray in rays:
+            if pinRay is not None and ray[0] not in pinRay:  # Pinned pieces may only slide along the pin
+                continue
+            for endRow, endCol in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] == allyColor:
+                    break
+                if kind != (GEN_CAPTURES if endPiece == "--" else GEN_QUIETS) and \
+                        (checkTargets is None or (endRow, endCol) in checkTargets):
+                    moves.append(Move((rows, cols), (endRow, endCol), self.board))
+                if endPiece != "--":
                     break
 
-    def getKnightMoves(self, rows, cols, moves):
-        piecePinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == rows and self.pins[i][1] == cols:
-                piecePinned = True
-                self.pins.remove(self.pins[i])
-                break
-        # ... (rest of logic unchanged)
-        direction = [(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, 2), (1, 2), (-1, -2), (1, -2)]
-        allyColor = 'w' if self.whiteToMove else 'b'
-        for move_dir in direction:  # Renamed 'move' to 'move_dir'
-            endRow = rows + move_dir[0]
-            endCol = cols + move_dir[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if not piecePinned:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] != allyColor: moves.append(Move((rows, cols), (endRow, endCol), self.board))
+    def getRookMoves(self, rows, cols, moves, kind=GEN_ALL):
+        self.getSlidingMoves(rows, cols, ROOK_RAYS[rows * 8 + cols], moves, kind)
 
-    def getQueenMoves(self, rows, cols, moves):
-        self.getRookMoves(rows, cols, moves)
-        self.getBishopMoves(rows, cols, moves)
+    def getBishopMoves(self, rows, cols, moves, kind=GEN_ALL):
+        self.getSlidingMoves(rows, cols, BISHOP_RAYS[rows * 8 + cols], moves, kind)
 
-    def getKingMoves(self, rows, cols, moves):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+    def getKnightMoves(self, rows, cols, moves, kind=GEN_ALL):
+        if (rows, cols) in self.pins:  # A pinned knight can never move
+            return
+        checkTargets = self.checkTargets
         allyColor = 'w' if self.whiteToMove else 'b'
-
-        # Store original king locations before simulation within this function
-        original_wK_loc = self.whiteKingLocation
-        original_bK_loc = self.blackKingLocation
-
-        for dr, dc in directions:
-            endRow, endCol = rows + dr, cols + dc
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor:
-                    # Temporarily update the correct king's location for check evaluation
-                    if allyColor == 'w':
-                        self.whiteKingLocation = (endRow, endCol)
-                    else:
-                        self.blackKingLocation = (endRow, endCol)
-                    king_would_be_in_check, _, _ = self.checkForPinsAndChecks()
-
-                    if not king_would_be_in_check:
-                        moves.append(Move((rows, cols), (endRow, endCol), self.board))
-
-                    self.whiteKingLocation = original_wK_loc
-                    self.blackKingLocation = original_bK_loc
+        skipColor = self.skippedColor(kind)
+        for endRow, endCol in KNIGHT_SQUARES[rows * 8 + cols]:
+            endColor = self.board[endRow][endCol][0]
+            if endColor != allyColor and endColor != skipColor and \
+                    (checkTargets is None or (endRow, endCol) in checkTargets):
+                moves.append(Move((rows, cols), (endRow, endCol), self.board))
+
+    def getQueenMoves(self, rows, cols, moves, kind=GEN_ALL):
+        self.getRookMoves(rows, cols, moves, kind)
+        self.getBishopMoves(rows, cols, moves, kind)
+
+    def skippedColor(self, kind):
+        # The color of destination squares a generator of this kind leaves out ('-' being an empty square)
+        if kind == GEN_CAPTURES:
+            return '-'
+        if kind == GEN_QUIETS:
+            return 'b' if self.whiteToMove else 'w'
+        return None
+
+    def getKingMoves(self, rows, cols, moves, kind=GEN_ALL):
+        allyColor = 'w' if self.whiteToMove else 'b'
+        skipColor = self.skippedColor(kind)
+        # One attack map per call; the king is lifted off the board so it cannot hide behind itself on a ray
+        attacked = self.getAttackMap('b' if self.whiteToMove else 'w', ignoreSquare=(rows, cols))
+        for endRow, endCol in KING_SQUARES[rows * 8 + cols]:
+            endColor = self.board[endRow][endCol][0]
+            if endColor != allyColor and endColor != skipColor and (endRow, endCol) not in attacked:
+                moves.append(Move((rows, cols), (endRow, endCol), self.board))
         # Castle moves handled by getCastleMove
 
     def getCastleMove(self, row, col, moves):
         if self.inCheck:
             return
-        if (self.whiteToMove and self.currentCastlingRight.whiteKingSide) or (
-                not self.whiteToMove and self.currentCastlingRight.blackKingSide):
+        if self.castlingRights & (CASTLE_WHITE_KING if self.whiteToMove else CASTLE_BLACK_KING):
             self.getKingSideMove(row, col, moves)
 
-        if (self.whiteToMove and self.currentCastlingRight.whiteQueenSide) or (
-                not self.whiteToMove and self.currentCastlingRight.blackQueenSide):
+        if self.castlingRights & (CASTLE_WHITE_QUEEN if self.whiteToMove else CASTLE_BLACK_QUEEN):
             self.getQueenSideMove(row, col, moves)
 
     def getKingSideMove(self, row, col, moves):
@@ -474,8 +846,9 @@ class GameState():
         # Squares (row, col+1) and (row, col+2) must be empty and not attacked
         if 0 <= col + 2 < 8:  # Defensive: ensure col+1 and col+2 are on board
             if self.board[row][col + 1] == '--' and self.board[row][col + 2] == '--':
-                if not self.squaresUnderAttack(row, col + 1) and \
-                        not self.squaresUnderAttack(row, col + 2):
+                enemyColor = 'b' if self.whiteToMove else 'w'
+                if not self.isSquareAttacked(row, col + 1, enemyColor) and \
+                        not self.isSquareAttacked(row, col + 2, enemyColor):
                     moves.append(Move((row, col), (row, col + 2), self.board, isCastleMove=True))
         # else: print(f"DEBUG: K-side castling squares for col {col} would be off board.")
 
@@ -485,57 +858,59 @@ class GameState():
             if self.board[row][col - 1] == '--' and \
                     self.board[row][col - 2] == '--' and \
                     self.board[row][col - 3] == '--':
-                if not self.squaresUnderAttack(row, col - 1) and \
-                        not self.squaresUnderAttack(row, col - 2):
+                enemyColor = 'b' if self.whiteToMove else 'w'
+                if not self.isSquareAttacked(row, col - 1, enemyColor) and \
+                        not self.isSquareAttacked(row, col - 2, enemyColor):
                     moves.append(Move((row, col), (row, col - 2), self.board, isCastleMove=True))
         # else: print(f"DEBUG: Q-side castling squares for col {col} would be off board.")
 
 
-    def squaresUnderAttack(self, r_target, c_target):
-        player_being_checked_turn = self.whiteToMove  # Player whose square safety is being checked
-
-        # Temporarily switch to opponent's perspective
-        self.whiteToMove = not player_being_checked_turn
-        _, opponent_pins, _ = self.checkForPinsAndChecks()  # We only need opponent's pins for their move generation
-
-        # Store and set pins for the opponent's move generation
-        pins_before_opp_move_gen = list(
-            self.pins)  # This would be pins on player_being_checked from opponent perspective
-        self.pins = opponent_pins  # Pins on opponent pieces by player_being_checked (relevant for opponent's moves)
-
-        # Opponent is by definition not "inCheck" by the player_being_checked when generating attacking moves
-        inCheck_before_opp_move_gen = self.inCheck
-        self.inCheck = False
-
-        attack_found = False
-        try:
-            # Get all non-king moves for the opponent
-            opponent_non_king_moves = self.getAllPossibleMoves()
-            for move in opponent_non_king_moves:
-                if move.endRow == r_target and move.endCol == c_target:
-                    attack_found = True
-                    break
-
-            if not attack_found:
-                # Get opponent's king moves separately
-                opp_king_row, opp_king_col = self.blackKingLocation if self.whiteToMove else self.whiteKingLocation  # Current self.whiteToMove is opponent
-                # For squaresUnderAttack, king moves are simpler: just direct attacks
-                king_directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-                for dr, dc in king_directions:
-                    if opp_king_row + dr == r_target and opp_king_col + dc == c_target:
-                        attack_found = True
+    def getAttackMap(self, byColor, ignoreSquare=None):
+        # Set of (row, col) squares attacked by byColor; ignoreSquare is treated as empty for sliding pieces
+        board = self.board
+        attacked = set()
+        pieces = self.pieceLists[byColor]
+        for r, c in pieces['N']:
+            attacked.update(KNIGHT_SQUARES[r * 8 + c])
+        for r, c in pieces['K']:
+            attacked.update(KING_SQUARES[r * 8 + c])
+        pawnRow = -1 if byColor == 'w' else 1
+        for r, c in pieces['p']:
+            if c > 0: attacked.add((r + pawnRow, c - 1))
+            if c < 7: attacked.add((r + pawnRow, c + 1))
+        for sliderTypes, table in (('RQ', ROOK_RAYS), ('BQ', BISHOP_RAYS)):
+            for pieceType in sliderTypes:
+                for r, c in pieces[pieceType]:
+                    for ray in table[r * 8 + c]:
+                        for square in ray:
+                            attacked.add(square)
+                            if board[square[0]][square[1]] != '--' and square != ignoreSquare:
+                                break
+        return attacked
+
+    def isSquareAttacked(self, row, col, byColor):
+        # Looks outward from (row, col) for a piece of byColor that attacks it; no moves are generated
+        board = self.board
+        sq = row * 8 + col
+        knight, pawn, king = byColor + 'N', byColor + 'p', byColor + 'K'
+        for r, c in KNIGHT_SQUARES[sq]:
+            if board[r][c] == knight: return True
+        for r, c in PAWN_ATTACKER_SQUARES[byColor][sq]:
+            if board[r][c] == pawn: return True
+        for r, c in KING_SQUARES[sq]:
+            if board[r][c] == king: return True
+        queen = byColor + 'Q'
+        for sliders, rays in ((byColor + 'R', ROOK_RAYS[sq]), (byColor + 'B', BISHOP_RAYS[sq])):
+            for ray in rays:
+                for r, c in ray:
+                    piece = board[r][c]
+                    if piece != '--':
+                        if piece == sliders or piece == queen: return True
                         break
-        finally:
-            # Restore state for the player_being_checked_turn
-            self.whiteToMove = player_being_checked_turn
-            self.pins = pins_before_opp_move_gen  # Restore pins that were relevant for player_being_checked_turn's context
-            self.inCheck = inCheck_before_opp_move_gen  # Restore inCheck state
-            # self.checks doesn't need complex restoration here as it's recalculated in getValidMoves
-
-        return attack_found
+        return False
 
     def checkForPinsAndChecks(self):  # This is for the current self.whiteToMove player
-        pins = []
+        pins = {}  # pinned (row, col) -> squares it may move to: the ray from the king up to and including the pinner
         checks = []
         inCheck = False
         if self.whiteToMove:
@@ -551,14 +926,16 @@ class GameState():
         for j in range(len(direction)):
             d = direction[j]
             possiblePin = ()
+            raySquares = set()
             for i in range(1, 8):
                 endRow = startRow + d[0] * i
                 endCol = startCol + d[1] * i
                 if 0 <= endRow < 8 and 0 <= endCol < 8:
+                    raySquares.add((endRow, endCol))
                     endPiece = self.board[endRow][endCol]
                     if endPiece[0] == allyColor and endPiece[1] != 'K':
                         if possiblePin == ():
-                            possiblePin = (endRow, endCol, d[0], d[1])
+                            possiblePin = (endRow, endCol)
                         else:
                             break
                     elif endPiece[0] == enemyColor:
@@ -577,7 +954,7 @@ class GameState():
                                 checks.append((endRow, endCol, d[0], d[1]))
                                 break
                             else:
-                                pins.append(possiblePin)
+                                pins[possiblePin] = raySquares
                                 break
                         else:
                             break
@@ -605,32 +982,49 @@ class CastleRights():
 
     def astuple(self): return (self.whiteKingSide, self.blackKingSide, self.whiteQueenSide, self.blackQueenSide)
 
+    @classmethod
+    def fromIndex(cls, index):  # from GameState.castlingRights bits
+        return cls(bool(index & CASTLE_WHITE_KING), bool(index & CASTLE_BLACK_KING),
+                   bool(index & CASTLE_WHITE_QUEEN), bool(index & CASTLE_BLACK_QUEEN))
+
+    def asIndex(self):  # 0-15, the GameState.castlingRights bits
+        return self.whiteKingSide | self.blackKingSide << 1 | self.whiteQueenSide << 2 | self.blackQueenSide << 3
+
     def __eq__(self, other): return isinstance(other, CastleRights) and self.astuple() == other.astuple()
 
     def __hash__(self): return hash(self.astuple())
 
 
+# Move.moveID packs the from square into bits 0-5 and the to square into bits 6-11 (sq = row * 8 + col). That is all
+# that tells two moves apart in one position, so the search stores moveIDs and findLegalMove turns them back into moves.
 class Move():
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'pieceCaptured',
+                 'isPawnPromotion', 'isEnpassantMove', 'isCastleMove', 'moveID')
+
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
     rowsToRanks = {v: k for k, v in ranksToRows.items()}
     filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
 
     def __init__(self, startSq, endSq, board, isEnpassantMove=False, isCastleMove=False):
-        self.startRow, self.startCol = startSq[0], startSq[1]
-        self.endRow, self.endCol = endSq[0], endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isPawnPromotion = (self.pieceMoved == 'wp' and self.endRow == 0) or \
-                               (self.pieceMoved == 'bp' and self.endRow == 7)
+        startRow, startCol = startSq
+        endRow, endCol = endSq
+        self.startRow, self.startCol = startRow, startCol
+        self.endRow, self.endCol = endRow, endCol
+        self.pieceMoved = pieceMoved = board[startRow][startCol]
+        self.pieceCaptured = board[endRow][endCol]
+        self.isPawnPromotion = (pieceMoved == 'wp' and endRow == 0) or (pieceMoved == 'bp' and endRow == 7)
         self.isEnpassantMove = isEnpassantMove
-        if self.isEnpassantMove: self.pieceCaptured = 'wp' if self.pieceMoved == 'bp' else 'bp'
+        if isEnpassantMove: self.pieceCaptured = 'wp' if pieceMoved == 'bp' else 'bp'
         self.isCastleMove = isCastleMove
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        self.moveID = (startRow * 8 + startCol) | (endRow * 8 + endCol) << 6
 
     def __eq__(self, other):
         return isinstance(other, Move) and self.moveID == other.moveID
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self, gs):  # gs is the GameState for context
         notation = ""
         # Pawn moves
@@ -662,4 +1056,77 @@ class Move():
         return notation
 
     def getRankFile(self, row, col):
-        return self.colsToFiles[col] + self.rowsToRanks[row]
\ No newline at end of file
+        return self.colsToFiles[col] + self.rowsToRanks[row]
+
+# --- Attack lookups ---
+# Per-square target lists (indexed by row * 8 + col) so GameState.isSquareAttacked can look outward
+# from the square instead of generating the opponent's moves.
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, 2), (1, 2), (-1, -2), (1, -2))
+KING_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def _targetSquares(offsets):
+    return [[(r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8]
+            for r in range(8) for c in range(8)]
+
+
+def _raySquares(directions):
+    # One list per direction, nearest square first; empty rays are left out
+    table = []
+    for r in range(8):
+        for c in range(8):
+            rays = []
+            for dr, dc in directions:
+                ray = [(r + dr * i, c + dc * i) for i in range(1, 8)
+                       if 0 <= r + dr * i < 8 and 0 <= c + dc * i < 8]
+                if ray:
+                    rays.append(ray)
+            table.append(rays)
+    return table
+
+
+KNIGHT_SQUARES = _targetSquares(KNIGHT_OFFSETS)
+KING_SQUARES = _targetSquares(KING_OFFSETS)
+# PAWN_ATTACKER_SQUARES['w'][sq] are the squares a white pawn attacks sq from
+PAWN_ATTACKER_SQUARES = {'w': _targetSquares(((1, -1), (1, 1))), 'b': _targetSquares(((-1, -1), (-1, 1)))}
+ROOK_RAYS = _raySquares(ROOK_DIRECTIONS)
+BISHOP_RAYS = _raySquares(BISHOP_DIRECTIONS)
+
+
+def _lineRays():
+    # LINE_RAYS[fromSq][toSq] is (ray from fromSq through toSq, 'R' or 'B') when the two share a line, else None
+    table = [[None] * 64 for _ in range(64)]
+    for sq in range(64):
+        for sliderType, rays in (('R', ROOK_RAYS[sq]), ('B', BISHOP_RAYS[sq])):
+            for ray in rays:
+                for r, c in ray:
+                    table[sq][r * 8 + c] = (ray, sliderType)
+    return table
+
+
+LINE_RAYS = _lineRays()
+# --- End Attack lookups ---
+
+# --- Perft ---
+def perft(gs, depth):
+    # Counts leaf nodes of the legal move tree; the standard check that a move generator is correct
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+STARTPOS_PERFT = [1, 20, 400, 8902, 197281, 4865609]  # Known node counts from the initial position, by depth
+# --- End Perft ---
+
+
+def newGameState(fen=None):
+    if fen is not None:
+        return GameState.from_fen(fen)
+    return GameState()
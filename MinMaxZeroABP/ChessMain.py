@@ -1,5 +1,5 @@
 import pygame as p
-import ChessEngine, MinMaxAI
+import ChessEngine, MinMaxAI, Trace
 
 BOARD_WIDTH = BOARD_HEIGHT = 512  #400 if it doesn't work well
 MOVE_LOG_PANEL_WIDTH = 250
@@ -8,6 +8,7 @@ DIMENSION = 8
 SQ_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15 #just for animation
 IMAGE = {}
+AI_MOVE_TIME = 5.0 # seconds the AI may think per move (no new depth is started after half of it)
 
 #Scorll Content
 SCROLL_BAR_WIDTH = 15
@@ -29,8 +30,9 @@ def main():
     moveLogFont = p.font.SysFont('Arial', 28, False, False)
     clock = p.time.Clock()
     screen.fill(p.Color('white'))
-    gs = ChessEngine.GameState()
+    gs = ChessEngine.newGameState()
     validMoves = gs.getValidMoves()
+    aiSearcher = MinMaxAI.Searcher() # keeps its tables warm from one move to the next
     moveMade = False
     animate = False
 
@@ -103,8 +105,9 @@ def main():
                     gameOver = False
                 #This would restart the game......USE FOR DEBUGGING ONLY
                 elif event.key == p.K_r:
-                    gs = ChessEngine.GameState()
+                    gs = ChessEngine.newGameState()
                     validMoves = gs.getValidMoves()
+                    aiSearcher.newGame()
                     sqSelected = ()
                     playerClicks = []
                     moveMade = False
@@ -114,7 +117,10 @@ def main():
         #Here for AI move finding logic
         """print(f"Loop Top: Turn: {'White' if gs.whiteToMove else 'Black'}, gameOver: {gameOver}, Checkmate: {gs.checkmate}, Stalemate: {gs.stalemate}")"""
         if not gameOver and not isHumanTurn:
-            AImove = MinMaxAI.findBestMoveMinMax(gs, validMoves)
+            AImove = aiSearcher.findBestMove(gs, validMoves, maxDepth=MinMaxAI.MAX_DEPTH,
+                                             softTimeLimit=AI_MOVE_TIME / 2, hardTimeLimit=AI_MOVE_TIME)
+            if Trace.levels['search'] >= Trace.INFO:
+                Trace.emit('search', aiSearcher.report())
             if AImove is None:
                 print(f"AI returned None. gs.checkmate={gs.checkmate}, gs.stalemate={gs.stalemate}.")
             '''if gs.whiteToMove:
@@ -1,14 +1,71 @@
 # MinMaxAI.py (Closer to original structure, with fixes and scoreBoard)
 
+import math
 import random
+import time
+
+import ChessEngine
 
 pieceScore = {"K": 0, "Q": 900, "R": 500, "B": 325, "N": 300, "p": 100}
 CHECKMATE = 2000
 STALEMATE = 0
-DEPTH = 4
+DEPTH = 4  # Default depth when no time limit is given
+MAX_DEPTH = 20  # Iterative deepening never goes past this
+MAX_PLY = 64  # Bound on plies from the root (main search, null moves and quiescence); sizes the killer table
 QDEPTHLIMIT = 6
-
-nextMove = None
+TT_SIZE_MB = 16  # Memory budget for the transposition table
+TIME_CHECK_INTERVAL = 64  # Nodes between clock/node-limit checks
+
+# Null-move pruning
+NULL_MOVE_PRUNING = True  # Default for Searcher.useNullMove
+NULL_MOVE_MIN_DEPTH = 3  # Remaining depth needed before passing the turn is tried
+NULL_MOVE_R = 2  # Depth reduction of the null-move search...
+NULL_MOVE_R_DEEP = 3  # ...and the larger one used from NULL_MOVE_DEEP_DEPTH on
+NULL_MOVE_DEEP_DEPTH = 7
+
+# Late move reductions
+LATE_MOVE_REDUCTIONS = True  # Default for Searcher.useLateMoveReductions
+LMR_MIN_DEPTH = 3  # Remaining depth needed before a move is reduced
+LMR_FULL_DEPTH_MOVES = 3  # Moves searched at full depth at every node before reductions start
+LMR_MAX_MOVES = 64  # Reduction table width; later moves use the last column
+LMR_BASE = 0.5  # Reduction = LMR_BASE + ln(depth) * ln(moveNumber) / LMR_DIVISOR, rounded down
+LMR_DIVISOR = 2.5
+
+# Static-eval pruning near the horizon. Margins are indexed by remaining depth; a technique is not used at
+# depths past the end of its tuple.
+FUTILITY_PRUNING = True  # Default for Searcher.useFutilityPruning: skip quiet moves that cannot reach alpha
+FUTILITY_MARGINS = (0, 200, 350, 500)
+REVERSE_FUTILITY_PRUNING = True  # Default for Searcher.useReverseFutilityPruning: static eval far above beta
+REVERSE_FUTILITY_MARGINS = (0, 150, 300, 450)
+RAZORING = True  # Default for Searcher.useRazoring: drop straight into quiescence far below alpha
+RAZOR_MARGINS = (0, 350, 550)
+SEE_PRUNING = True  # Default for Searcher.useSeePruning: quiescence skips captures that lose material by SEE
+
+# Quiescence bounds checked before the mobility terms are computed
+LAZY_EVAL = True  # Default for Searcher.useLazyEval: stand pat on material + piece squares when that clears beta
+LAZY_EVAL_MARGIN = 200  # Largest swing expected from the mobility terms
+DELTA_PRUNING = True  # Default for Searcher.useDeltaPruning: skip captures that cannot bring the score to alpha
+DELTA_MARGIN = 300  # Safety margin on top of the captured piece's value
+
+# Heuristic score bonuses for ordering
+HASH_MOVE_BONUS     = 100000 # Best move from the previous iteration or the transposition table
+KILLER_MOVE_BONUS_1 = 200 # Primary killer move
+KILLER_MOVE_BONUS_2 = 180 # Secondary killer move
+CHECK_BONUS         = 10  # Bonus for delivering a check (significant, but below captures/killers)
+COUNTERMOVE_BONUS   = 0   # Default Searcher.counterMoveBonus: the quiet move that last refuted the opponent's move
+CONTINUATION_WEIGHT = 0   # Default Searcher.continuationWeight: continuation history relative to from-to history
+# Both are off by default: no tried weight saved nodes on Bench.py's game and mixed suites
+MVV_LVA_SCALE       = 100 # ChessEngine.MVV_LVA_TABLE counts pawns; in centipawns captures rank above killers
+
+# Countermove and continuation history tables are keyed by pieceToIndex: moved piece and destination square
+PIECE_TO_BASE = {piece: i * 64 for i, piece in enumerate(('wp', 'wN', 'wB', 'wR', 'wQ', 'wK',
+                                                          'bp', 'bN', 'bB', 'bR', 'bQ', 'bK'))}
+PIECE_TO_SIZE = 12 * 64
+EMPTY_CONTINUATION_ROW = [0] * PIECE_TO_SIZE  # read-only stand-in for rows nothing has been stored in yet
+
+
+def pieceToIndex(move):
+    return PIECE_TO_BASE[move.pieceMoved] + move.endRow * 8 + move.endCol
 
 # --- Table/Value ---
 MOBILITYWEIGHTS = {
@@ -102,45 +159,34 @@ def findRandomMove(validMoves):  # Corrected parameter name
 
 
 # --- Material ---
-def scoreMaterial(board):
+def scoreMaterial(gs):
     score = 0
-    for row in board:
-        for square in row:
-            if square[0] == 'w':
-                score += pieceScore[square[1]]
-            elif square[0] == 'b':
-                score -= pieceScore[square[1]]
+    for pieceType, value in pieceScore.items():
+        score += value * (len(gs.pieceLists['w'][pieceType]) - len(gs.pieceLists['b'][pieceType]))
     return score
 
 # --- Mobility ---
 def mobilityEvaluation(gs, forWhitePlayer, currentPhaseWeights):
     playerMobilityScore = 0
 
-    for r in range(8):
-        for c in range(8):
-            pieceStr = gs.board[r][c]
-            if pieceStr != '--':
-                pieceColor = pieceStr[0]
-                pieceType = pieceStr[1]
-
-                if (forWhitePlayer and pieceColor == 'w') or \
-                        (not forWhitePlayer and pieceColor == 'b'):
-
-                    numMovesForPiece = 0
-                    if pieceType == 'p':
-                        numMovesForPiece = countPseudoLegalPawnMoves(gs, r, c, forWhitePlayer)
-                    elif pieceType == 'N':
-                        numMovesForPiece = countPseudoLegalKnightMoves(gs, r, c, forWhitePlayer)
-                    elif pieceType == 'B':
-                        numMovesForPiece = countPseudoLegalBishopMoves(gs, r, c, forWhitePlayer)
-                    elif pieceType == 'R':
-                        numMovesForPiece = countPseudoLegalRookMoves(gs, r, c, forWhitePlayer)
-                    elif pieceType == 'Q':
-                        numMovesForPiece = countPseudoLegalQueenMoves(gs, r, c, forWhitePlayer)
-                    elif pieceType == 'K':
-                        numMovesForPiece = countPseudoLegalKingMoves(gs, r, c, forWhitePlayer)
-
-                    playerMobilityScore += numMovesForPiece * currentPhaseWeights.get(pieceType, 0)
+    for pieceType, squares in gs.pieceLists['w' if forWhitePlayer else 'b'].items():
+        weight = currentPhaseWeights.get(pieceType, 0)
+        for r, c in squares:
+            numMovesForPiece = 0
+            if pieceType == 'p':
+                numMovesForPiece = countPseudoLegalPawnMoves(gs, r, c, forWhitePlayer)
+            elif pieceType == 'N':
+                numMovesForPiece = countPseudoLegalKnightMoves(gs, r, c, forWhitePlayer)
+            elif pieceType == 'B':
+                numMovesForPiece = countPseudoLegalBishopMoves(gs, r, c, forWhitePlayer)
+            elif pieceType == 'R':
+                numMovesForPiece = countPseudoLegalRookMoves(gs, r, c, forWhitePlayer)
+            elif pieceType == 'Q':
+                numMovesForPiece = countPseudoLegalQueenMoves(gs, r, c, forWhitePlayer)
+            elif pieceType == 'K':
+                numMovesForPiece = countPseudoLegalKingMoves(gs, r, c, forWhitePlayer)
+
+            playerMobilityScore += numMovesForPiece * weight
 
     return playerMobilityScore
 
@@ -227,39 +273,16 @@ def countPseudoLegalKingMoves(gs, row, col, isWhitePlayer):
     return count
 
 def getGamePhase(gs):
-    materialCountNoPawnsKings = 0
-    numQueensWhite = 0
-    numQueensBlack = 0
-
-    whiteMinorPieces = 0
-    blackMinorPieces = 0
-    whiteMajorPieces = 0  # Rooks, Queens
-    blackMajorPieces = 0
-
-    for row in range(8):
-        for col in range(8):
-            pieceStr = gs.board[row][col]
-            if pieceStr != '--':
-                color = pieceStr[0]
-                pieceType = pieceStr[1]
-                if pieceType == 'Q':
-                    if color == 'w':
-                        numQueensWhite += 1
-                    else:
-                        numQueensBlack += 1
-                if pieceType in ['N', 'B']:
-                    if color == 'w':
-                        whiteMinorPieces += 1
-                    else:
-                        blackMinorPieces += 1
-                if pieceType in ['R', 'Q']:
-                    if color == 'w':
-                        whiteMajorPieces += 1
-                    else:
-                        blackMajorPieces += 1
-
-                if pieceType not in ['p', 'K']:
-                    materialCountNoPawnsKings += 1
+    white, black = gs.pieceLists['w'], gs.pieceLists['b']
+    numQueensWhite = len(white['Q'])
+    numQueensBlack = len(black['Q'])
+
+    whiteMinorPieces = len(white['N']) + len(white['B'])
+    blackMinorPieces = len(black['N']) + len(black['B'])
+    whiteMajorPieces = len(white['R']) + numQueensWhite  # Rooks, Queens
+    blackMajorPieces = len(black['R']) + numQueensBlack
+
+    materialCountNoPawnsKings = whiteMinorPieces + blackMinorPieces + whiteMajorPieces + blackMajorPieces
     isEndgame = False
     if numQueensWhite == 0 and numQueensBlack == 0:
         isEndgame = True
@@ -271,7 +294,7 @@ def getGamePhase(gs):
             isEndgame = True
     if isEndgame:
         return 'end'
-    if len(gs.moveLog) < 20 and materialCountNoPawnsKings > 8:
+    if gs.gamePly() < 20 and materialCountNoPawnsKings > 8:
         return 'opening'
     return 'middle'
 
@@ -282,35 +305,17 @@ def evaluatePiecePositions(gs):
     score = 0
     game_phase = getGamePhase(gs)  # You already have this
 
-    for r in range(8):
-        for c in range(8):
-            piece = gs.board[r][c]
-            if piece != '--':
-                p_color, p_type = piece[0], piece[1]
-
-                current_pst_value = 0
-                if p_type == 'p':
-                    current_pst_value = pawnPST[r][c] if p_color == 'w' else pawnPST[7 - r][c]
-                elif p_type == 'N':
-                    current_pst_value = knightPST[r][c] if p_color == 'w' else knightPST[7 - r][c]
-                elif p_type == 'B':
-                    current_pst_value = bishopPST[r][c] if p_color == 'w' else bishopPST[7 - r][c]
-                elif p_type == 'R':
-                    current_pst_value = rookPST[r][c] if p_color == 'w' else rookPST[7 - r][c]
-                elif p_type == 'Q':
-                    current_pst_value = queenPST[r][c] if p_color == 'w' else queenPST[7 - r][c]
-                elif p_type == 'K':
-                    if game_phase == 'end':
-                        current_pst_value = kingPSTEndgame[r][c] if p_color == 'w' else \
-                        kingPSTEndgame[7 - r][c]
-                    else:  # opening/middlegame
-                        current_pst_value = kingPSTMiddlegame[r][c] if p_color == 'w' else \
-                        kingPSTMiddlegame[7 - r][c]
-
-                if p_color == 'w':
-                    score += current_pst_value
-                else:  # black piece
-                    score -= current_pst_value  # Subtract black's positional advantage (from white's perspective)
+    pieceTables = {'p': pawnPST, 'N': knightPST, 'B': bishopPST, 'R': rookPST, 'Q': queenPST,
+                   'K': kingPSTEndgame if game_phase == 'end' else kingPSTMiddlegame}
+
+    for p_type, squares in gs.pieceLists['w'].items():
+        table = pieceTables[p_type]
+        for r, c in squares:
+            score += table[r][c]
+    for p_type, squares in gs.pieceLists['b'].items():
+        table = pieceTables[p_type]
+        for r, c in squares:
+            score -= table[7 - r][c]  # Subtract black's positional advantage (from white's perspective)
     return score
 
 # --- End of Position/Structure ---
@@ -328,153 +333,664 @@ def scoreBoard(gs):
             return CHECKMATE  # White wins
     elif gs.stalemate:
         return STALEMATE
-    currentScore = scoreMaterial(gs.board)
+    currentScore = scoreMaterial(gs)
 
     # 2. Mobility Score
-    currentPhase = getGamePhase(gs)
-    phaseSpecificWeights = MOBILITYWEIGHTS[currentPhase]
-
-    whiteMobilityScore = mobilityEvaluation(gs, True, phaseSpecificWeights)
-    blackMobilityScore = mobilityEvaluation(gs, False, phaseSpecificWeights)
-
-    mobilityBonus = whiteMobilityScore - blackMobilityScore
-    currentScore += mobilityBonus
+    currentScore += scoreMobility(gs)
 
     positionScore = evaluatePiecePositions(gs)
     currentScore += positionScore
 
     return currentScore
-# --- End of Score ---
 
-def findMoveMinMaxABPruning(gs, validMoves, depth, alpha, beta,
-                            turnWhite):
-    global nextMove
 
-    if depth == 0:
-        return quiecenceSearch(gs, alpha, beta, turnWhite, QDEPTHLIMIT)
-
-    current_player_valid_moves = list(validMoves)
+def scoreMobility(gs):
+    phaseSpecificWeights = MOBILITYWEIGHTS[getGamePhase(gs)]
+    whiteMobilityScore = mobilityEvaluation(gs, True, phaseSpecificWeights)
+    blackMobilityScore = mobilityEvaluation(gs, False, phaseSpecificWeights)
+    return whiteMobilityScore - blackMobilityScore
 
-    if depth == DEPTH and not nextMove and current_player_valid_moves:
-        nextMove = current_player_valid_moves[0]
 
-    if turnWhite:  # Maximizing player (White)
-        maxScore = -CHECKMATE - 1  # Initialize slightly below worst score for White
-        for move in current_player_valid_moves:
-            gs.makeMove(move)
-            opponent_valid_moves = gs.getValidMoves()
+def captureGain(move):
+    # Material a capture or promotion wins before any recapture
+    gain = pieceScore[move.pieceCaptured[1]] if move.pieceCaptured != '--' else 0
+    if move.isPawnPromotion:
+        gain += pieceScore['Q'] - pieceScore['p']
+    return gain
 
-            if gs.checkmate:  # Black is checkmated by White's move
-                score = CHECKMATE
-            elif gs.stalemate:  # Stalemate after White's move
-                score = STALEMATE
-            else:  # Black has moves, recurse for Black's turn
-                score = findMoveMinMaxABPruning(gs, opponent_valid_moves, depth - 1, alpha, beta, False)
 
-            gs.undoMove()
+def maxCaptureGain(gs, turnWhite):
+    # Upper bound on captureGain over every move of the side to move: its best victim plus a promotion
+    enemy = gs.pieceLists['b' if turnWhite else 'w']
+    gain = max([pieceScore[pieceType] for pieceType in ('Q', 'R', 'B', 'N', 'p') if enemy[pieceType]] + [0])
+    promotionRow = 1 if turnWhite else 6
+    if any(r == promotionRow for r, c in gs.pieceLists['w' if turnWhite else 'b']['p']):
+        gain += pieceScore['Q'] - pieceScore['p']
+    return gain
+# --- End of Score ---
 
-            if score > maxScore:
-                maxScore = score
-                if depth == DEPTH:
-                    nextMove = move
+# --- Transposition Table ---
+TT_EXACT = 0  # score is the true minimax value
+TT_LOWER = 1  # search failed high, true value >= score
+TT_UPPER = 2  # search failed low, true value <= score
+TT_QDEPTH = 0  # depth stored for quiescence entries, main search entries are always deeper
+
+
+class TranspositionTable():
+    # Rough cost of one slot: list pointer + 6-tuple + 64-bit key + score and move ints
+    ENTRY_BYTES = 200
+
+    def __init__(self, sizeMB=TT_SIZE_MB):
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        self.sizeMB = sizeMB
+        # Keep the slot count a power of two so the index is a single AND on the Zobrist key
+        slots = 1
+        while slots * 2 * self.ENTRY_BYTES <= sizeMB * 1024 * 1024:
+            slots *= 2
+        self.mask = slots - 1
+        self.entries = [None] * slots
+        self.age = 0
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    def newSearch(self):
+        # Entries from earlier searches stay usable but are the first to be replaced
+        self.age += 1
+        self.resetStats()
+
+    def probe(self, key):
+        # Returns (key, depth, score, flag, bestMoveID, age) or None
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
 
-            alpha = max(alpha, maxScore)  # White (maximizer) updates alpha
-            if alpha >= beta:  # Pruning condition
+    def store(self, key, depth, score, flag, bestMove):
+        index = key & self.mask
+        old = self.entries[index]
+        # Always-replace for stale or shallower entries, otherwise depth-preferred, also for the same position:
+        # a quiescence store must not overwrite a deeper result from this search
+        if old is None or old[5] != self.age or depth >= old[1]:
+            bestMoveID = bestMove.moveID if bestMove is not None else None
+            if old is not None and old[0] == key and bestMoveID is None:
+                bestMoveID = old[4]  # keep the old best move when this search found none
+            self.entries[index] = (key, depth, score, flag, bestMoveID, self.age)
+            self.stores += 1
+        elif old[0] == key and bestMove is not None:
+            self.entries[index] = old[:4] + (bestMove.moveID, old[5])  # keep the deeper bound, take the newer move
+
+    def report(self):
+        hitRate = 100 * self.hits / self.probes if self.probes else 0
+        cutoffRate = 100 * self.cutoffs / self.probes if self.probes else 0
+        return f"TT: {self.probes} probes, {self.hits} hits ({hitRate:.1f}%), " \
+               f"{self.cutoffs} cutoffs ({cutoffRate:.1f}%), {self.stores} stores"
+
+
+def putMoveFirst(moves, moveID):
+    # Search the table's best move first; moves are compared by moveID like Move.__eq__
+    if moveID is None:
+        return moves
+    for i, move in enumerate(moves):
+        if move.moveID == moveID:
+            if i:
+                moves.insert(0, moves.pop(i))
+            break
+    return moves
+# --- End Transposition Table ---
+
+
+def buildReductionTable(base=LMR_BASE, divisor=LMR_DIVISOR):
+    # table[depth][moveNumber] -> plies a late quiet move is reduced by; moveNumber counts from 1
+    table = [[0] * LMR_MAX_MOVES for _ in range(MAX_DEPTH + 1)]
+    for depth in range(1, MAX_DEPTH + 1):
+        for moveNumber in range(1, LMR_MAX_MOVES):
+            table[depth][moveNumber] = max(0, int(base + math.log(depth) * math.log(moveNumber) / divisor))
+    return table
+
+
+class SearchAborted(Exception):
+    # Raised inside the search when the hard deadline or node limit is hit
+    pass
+
+
+class Searcher():
+    # One engine instance: owns its transposition table, killer/history tables, limits and statistics,
+    # so several searches can run in one process. Keep one Searcher per game to reuse its warm tables.
+    def __init__(self, maxDepth=DEPTH, qDepthLimit=QDEPTHLIMIT, ttSizeMB=TT_SIZE_MB):
+        self.maxDepth = maxDepth
+        self.qDepthLimit = qDepthLimit
+        self.transpositionTable = TranspositionTable(ttSizeMB)
+        self.killerMoves = [[None, None] for _ in range(MAX_PLY)]  # Two killer moves per ply from the root
+        self.historyTable = [0] * 4096  # indexed by Move.moveID (from_sq | to_sq << 6)
+        self.counterMoves = [None] * PIECE_TO_SIZE  # pieceToIndex(opponent's move) -> moveID of the reply that cut off
+        # pieceToIndex(opponent's move) -> row of scores indexed by pieceToIndex(reply); rows are made on first use
+        self.continuationHistory = [None] * PIECE_TO_SIZE
+        self.counterMoveBonus = COUNTERMOVE_BONUS
+        self.continuationWeight = CONTINUATION_WEIGHT
+        self.useNullMove = NULL_MOVE_PRUNING
+        self.useLateMoveReductions = LATE_MOVE_REDUCTIONS
+        self.reductionTable = buildReductionTable()
+        self.useFutilityPruning = FUTILITY_PRUNING
+        self.futilityMargins = FUTILITY_MARGINS
+        self.useReverseFutilityPruning = REVERSE_FUTILITY_PRUNING
+        self.reverseFutilityMargins = REVERSE_FUTILITY_MARGINS
+        self.useRazoring = RAZORING
+        self.razorMargins = RAZOR_MARGINS
+        self.useSeePruning = SEE_PRUNING
+        self.useLazyEval = LAZY_EVAL
+        self.useDeltaPruning = DELTA_PRUNING
+
+        # Iterative deepening state for the search in progress
+        self.nextMove = None
+        self.searchDepth = maxDepth
+        self.staticEvalDepth = 0
+        self.rootPly = None  # len(gs.moveLog) at the root of the last search
+        self.resetStats()
+        self.deadline = None
+        self.nodeLimit = None
+
+    def newGame(self):
+        self.transpositionTable.resize(self.transpositionTable.sizeMB)
+        self.clearOrderingTables()
+
+    def clearOrderingTables(self):
+        self.killerMoves = [[None, None] for _ in range(MAX_PLY)]
+        self.historyTable = [0] * 4096
+        self.counterMoves = [None] * PIECE_TO_SIZE
+        self.continuationHistory = [None] * PIECE_TO_SIZE
+        self.rootPly = None
+
+    def ageOrderingTables(self, rootPly):
+        # Between two searches of one game: history is halved rather than wiped, and killers move with the game,
+        # so the last search's ply 2 becomes ply 0 when both sides have moved once since.
+        self.historyTable = [score >> 1 for score in self.historyTable]
+        if self.continuationWeight:  # nothing reads the rows while the weight is 0
+            self.continuationHistory = [[score >> 1 for score in row] if row is not None else None
+                                        for row in self.continuationHistory]
+        playedPlies = rootPly - self.rootPly if self.rootPly is not None else MAX_PLY
+        if 0 <= playedPlies < MAX_PLY:
+            self.killerMoves = self.killerMoves[playedPlies:] + [[None, None] for _ in range(playedPlies)]
+        else:  # a different game or a position taken back
+            self.killerMoves = [[None, None] for _ in range(MAX_PLY)]
+        self.rootPly = rootPly
+
+    def resetStats(self):
+        self.nodes = 0
+        # How often each pruning technique fired (lmrReSearch: reduced searches that had to be repeated)
+        self.pruneCounts = dict.fromkeys(('nullMove', 'reverseFutility', 'razoring', 'futility', 'lmrReSearch',
+                                         'losingCapture', 'lazyEval', 'deltaNode', 'deltaCapture'), 0)
+
+    def report(self):
+        prunes = ", ".join(f"{name} {count}" for name, count in self.pruneCounts.items())
+        return f"Depth {self.searchDepth}, {self.nodes} nodes ({prunes}). {self.transpositionTable.report()}"
+
+    def countNode(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+                raise SearchAborted()
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+
+    def probeTranspositionTable(self, gs, depth, alpha, beta):
+        # Returns (score or None, bestMoveID). A score means the stored bound already decides this node.
+        entry = self.transpositionTable.probe(gs.zobristKey)
+        if entry is None:
+            return None, None
+        if entry[1] >= depth:
+            score, flag = entry[2], entry[3]
+            if flag == TT_EXACT or (flag == TT_LOWER and score >= beta) or (flag == TT_UPPER and score <= alpha):
+                self.transpositionTable.cutoffs += 1
+                return score, entry[4]
+        return None, entry[4]
+
+    def storeTranspositionTable(self, gs, depth, score, alphaOrig, betaOrig, bestMove):
+        if score <= alphaOrig:
+            flag = TT_UPPER
+        elif score >= betaOrig:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.transpositionTable.store(gs.zobristKey, depth, score, flag, bestMove)
+
+    def findBestMove(self, gs, validMoves, maxDepth=None, softTimeLimit=None, hardTimeLimit=None,
+                     nodeLimit=None):
+        # Iterative deepening: depth 1, 2, 3... until maxDepth, the time limits or the node limit stop it.
+        # The answer is always the best move of the last iteration that finished.
+        self.nextMove = None
+
+        if not validMoves:
+            return None
+
+        self.ageOrderingTables(len(gs.moveLog))
+        self.transpositionTable.newSearch()
+        startTime = time.perf_counter()
+        self.deadline = startTime + hardTimeLimit if hardTimeLimit is not None else None
+        self.nodeLimit = nodeLimit
+        self.resetStats()
+        # Deepest remaining depth at which an enabled technique needs the static evaluation
+        self.staticEvalDepth = max([len(margins) - 1 for enabled, margins in (
+            (self.useFutilityPruning, self.futilityMargins),
+            (self.useReverseFutilityPruning, self.reverseFutilityMargins),
+            (self.useRazoring, self.razorMargins)) if enabled] + [0])
+        rootPly = self.rootPly
+        bestMove = None
+
+        for depth in range(1, min(maxDepth or self.maxDepth, MAX_DEPTH) + 1):
+            self.searchDepth = depth
+            self.nextMove = None
+            try:
+                self.findMoveMinMaxABPruning(gs, validMoves, depth, -CHECKMATE, CHECKMATE, gs.whiteToMove,
+                                             bestMove.moveID if bestMove is not None else None)
+            except SearchAborted:
+                gs.undoToPly(rootPly)  # unwind the moves the interrupted iteration left on the board
                 break
-        return maxScore
-
-    else:  # Minimizing player
-        minScore = CHECKMATE + 1  # Initialize slightly above best score for White
-        for move in current_player_valid_moves:
-            gs.makeMove(move)
-            opponent_valid_moves = gs.getValidMoves()
-
-            if gs.checkmate:  # White is checkmated by Black's move
-                score = -CHECKMATE
-            elif gs.stalemate:  # Stalemate after Black's move
-                score = STALEMATE
-            else:  # White has moves, recurse for White's turn
-                score = findMoveMinMaxABPruning(gs, opponent_valid_moves, depth - 1, alpha, beta, True)
-
-            gs.undoMove()
-
-            if score < minScore:
-                minScore = score
-                if depth == DEPTH:
-                    nextMove = move
-
-            beta = min(beta, minScore)  # Black (minimizer) updates beta
-            if beta <= alpha:  # Pruning condition
+            bestMove = self.nextMove
+            if softTimeLimit is not None and time.perf_counter() - startTime >= softTimeLimit:
                 break
-        return minScore
 
-
-def findBestMoveMinMax(gs, validMoves):  # Corrected parameter name
-    global nextMove
-    nextMove = None
-
-    if not validMoves:
+        self.nextMove = bestMove
+        if self.nextMove is None and validMoves:
+            # print("MinMaxAI: nextMove was None after search, choosing random move.")
+            self.nextMove = findRandomMove(validMoves)
+
+        return self.nextMove
+
+    def findMoveMinMaxABPruning(self, gs, validMoves, depth, alpha, beta,
+                                turnWhite, rootBestMoveID=None, allowNull=True):
+        # validMoves is the root's legal move list; inner nodes get None and generate their moves in stages.
+        # allowNull is False right after a null move, so the side to move never passes twice in a row.
+        if depth == 0:
+            return self.quiecenceSearch(gs, alpha, beta, turnWhite, self.qDepthLimit)
+
+        self.countNode()
+        currentPly = len(gs.moveLog) + len(gs.nullMoveStack) - self.rootPly
+        if currentPly >= MAX_PLY:
+            currentPly = MAX_PLY - 1  # deeper plies share the last slot; no search gets this far in practice
+        killerMoves = self.killerMoves
+        # The opponent's last move, for countermoves and continuation history; after a null move there is none
+        previousMove = gs.moveLog[-1] if allowNull and gs.moveLog else None
+        inCheck = gs.isInCheck()
+        futilityScore = None  # set when quiet moves here cannot get past alpha/beta
+
+        alphaOrig, betaOrig = alpha, beta
+        if depth == self.searchDepth:  # the root still has to pick nextMove, so it orders by the last iteration instead
+            ttMoveID = rootBestMoveID
+        else:
+            if gs.isDrawByRule():
+                return STALEMATE
+            ttScore, ttMoveID = self.probeTranspositionTable(gs, depth, alpha, beta)
+            if ttScore is not None:
+                return ttScore
+            if not inCheck and depth <= self.staticEvalDepth:
+                staticEval = scoreBoard(gs)
+                prunedScore = self.staticEvalPruning(gs, depth, alpha, beta, turnWhite, staticEval)
+                if prunedScore is not None:
+                    return prunedScore
+                futilityScore = self.futilityScore(depth, alpha, beta, turnWhite, staticEval)
+            if allowNull and self.useNullMove and depth >= NULL_MOVE_MIN_DEPTH and not inCheck:
+                nullScore = self.nullMoveSearch(gs, depth, alpha, beta, turnWhite)
+                if nullScore is not None:
+                    return nullScore
+
+        if validMoves is not None:
+            currentPlayerValidMoves = self.moveOrder(gs, validMoves, currentPly, ttMoveID, previousMove)
+        else:
+            currentPlayerValidMoves = gs.iter_moves(ttMoveID, killerMoves[currentPly], self.quietScorer(previousMove))
+        bestMove = None
+        # Late quiet moves get a reduced null-window search first; none are reduced while in check
+        canReduce = self.useLateMoveReductions and depth >= LMR_MIN_DEPTH and not inCheck
+        checkQuiet = canReduce or futilityScore is not None
+        reductionRow = self.reductionTable[min(depth, MAX_DEPTH)]
+
+        if turnWhite:  # Maximizing player (White)
+            maxScore = -CHECKMATE - 1  # Initialize slightly below worst score for White
+            for moveNumber, move in enumerate(currentPlayerValidMoves):
+                quiet = checkQuiet and moveNumber > 0 and self.isQuietMove(gs, move)
+                if quiet and futilityScore is not None:  # the first move is always searched
+                    self.pruneCounts['futility'] += 1
+                    maxScore = max(maxScore, futilityScore)
+                    continue
+                gs.makeMove(move)
+                reduction = 0
+                if quiet and canReduce and moveNumber >= LMR_FULL_DEPTH_MOVES:
+                    reduction = self.lateMoveReduction(move, depth, moveNumber, reductionRow, currentPly)
+                if reduction:
+                    score = self.findMoveMinMaxABPruning(gs, None, depth - 1 - reduction, alpha, alpha + 1, False)
+                    if score > alpha:  # the reduced search beat alpha, so it has to be confirmed at full depth
+                        self.pruneCounts['lmrReSearch'] += 1
+                        score = self.findMoveMinMaxABPruning(gs, None, depth - 1, alpha, beta, False)
+                else:
+                    score = self.findMoveMinMaxABPruning(gs, None, depth - 1, alpha, beta, False)
+                gs.undoMove()
+
+                if score > maxScore:
+                    maxScore = score
+                    bestMove = move
+                    if depth == self.searchDepth:
+                        self.nextMove = move
+
+                alpha = max(alpha, maxScore)  # White (maximizer) updates alpha
+                if alpha >= beta:  # Pruning condition
+                    self.storeCutoff(move, depth, currentPly, previousMove)
+                    break
+            if bestMove is None:
+                return self.noMovesScore(gs)
+            self.storeTranspositionTable(gs, depth, maxScore, alphaOrig, betaOrig, bestMove)
+            return maxScore
+
+        else:  # Minimizing player
+            minScore = CHECKMATE + 1  # Initialize slightly above best score for White
+            for moveNumber, move in enumerate(currentPlayerValidMoves):
+                quiet = checkQuiet and moveNumber > 0 and self.isQuietMove(gs, move)
+                if quiet and futilityScore is not None:  # the first move is always searched
+                    self.pruneCounts['futility'] += 1
+                    minScore = min(minScore, futilityScore)
+                    continue
+                gs.makeMove(move)
+                reduction = 0
+                if quiet and canReduce and moveNumber >= LMR_FULL_DEPTH_MOVES:
+                    reduction = self.lateMoveReduction(move, depth, moveNumber, reductionRow, currentPly)
+                if reduction:
+                    score = self.findMoveMinMaxABPruning(gs, None, depth - 1 - reduction, beta - 1, beta, True)
+                    if score < beta:  # the reduced search beat beta, so it has to be confirmed at full depth
+                        self.pruneCounts['lmrReSearch'] += 1
+                        score = self.findMoveMinMaxABPruning(gs, None, depth - 1, alpha, beta, True)
+                else:
+                    score = self.findMoveMinMaxABPruning(gs, None, depth - 1, alpha, beta, True)
+                gs.undoMove()
+
+                if score < minScore:
+                    minScore = score
+                    bestMove = move
+                    if depth == self.searchDepth:
+                        self.nextMove = move
+
+                beta = min(beta, minScore)  # Black (minimizer) updates beta
+                if beta <= alpha:  # Pruning condition
+                    self.storeCutoff(move, depth, currentPly, previousMove)
+                    break
+            if bestMove is None:
+                return self.noMovesScore(gs)
+            self.storeTranspositionTable(gs, depth, minScore, alphaOrig, betaOrig, bestMove)
+            return minScore
+
+    def storeCutoff(self, move, depth, ply, previousMove):
+        # Remember a move that caused a cutoff. A quiet one also becomes a killer, the countermove of previousMove
+        # and gains continuation history; those two tables are only kept while their weight is switched on.
+        if move.pieceCaptured == '--' and not move.isPawnPromotion:  # It's a quiet move
+            killers = self.killerMoves[ply]
+            if killers[0] != move:  # Not already primary killer
+                killers[1] = killers[0]  # Shift K1 to K2
+                killers[0] = move  # New K1
+            if previousMove is not None and (self.counterMoveBonus or self.continuationWeight):
+                previousIndex = pieceToIndex(previousMove)
+                if self.counterMoveBonus:
+                    self.counterMoves[previousIndex] = move.moveID
+                if self.continuationWeight:
+                    row = self.continuationHistory[previousIndex]
+                    if row is None:
+                        row = self.continuationHistory[previousIndex] = [0] * PIECE_TO_SIZE
+                    row[pieceToIndex(move)] += depth * depth
+
+        self.historyTable[move.moveID] += depth * depth  # Add bonus based on remaining depth
+
+    def quietScorer(self, previousMove):
+        # Ordering score for quiet moves: from-to history, plus continuation history and the countermove bonus
+        # for replies to previousMove
+        historyTable = self.historyTable
+        counterMoveBonus, continuationWeight = self.counterMoveBonus, self.continuationWeight
+        if previousMove is None or not (counterMoveBonus or continuationWeight):
+            return lambda move: historyTable[move.moveID]
+        previousIndex = pieceToIndex(previousMove)
+        counterMoveID = self.counterMoves[previousIndex]
+        row = self.continuationHistory[previousIndex] or EMPTY_CONTINUATION_ROW
+        return lambda move: historyTable[move.moveID] + continuationWeight * row[pieceToIndex(move)] + \
+            (counterMoveBonus if move.moveID == counterMoveID else 0)
+
+    def isQuietMove(self, gs, move):
+        # Called before gs.makeMove(move): no capture, no promotion and no check on the opponent
+        return move.pieceCaptured == '--' and not move.isPawnPromotion and not gs.givesCheck(move)
+
+    def lateMoveReduction(self, move, depth, moveNumber, reductionRow, ply):
+        # Plies to reduce a late quiet move by. Killers are not reduced and at least one ply of main search is left.
+        if move in self.killerMoves[ply]:
+            return 0
+        return min(reductionRow[min(moveNumber + 1, LMR_MAX_MOVES - 1)], depth - 2)
+
+    def staticEvalPruning(self, gs, depth, alpha, beta, turnWhite, staticEval):
+        # Reverse futility and razoring; returns the node's score when one of them decides it, else None.
+        # Scores are from White's side, so Black's tests are the mirror image of White's.
+        sign = 1 if turnWhite else -1
+        if self.useReverseFutilityPruning and depth < len(self.reverseFutilityMargins):
+            # So far above beta (below alpha for Black) that even losing the margin still fails high
+            margin = self.reverseFutilityMargins[depth]
+            if (turnWhite and staticEval - margin >= beta) or (not turnWhite and staticEval + margin <= alpha):
+                self.pruneCounts['reverseFutility'] += 1
+                return staticEval - sign * margin
+        if self.useRazoring and depth < len(self.razorMargins):
+            # So far below alpha (above beta for Black) that only a tactic could help: let quiescence look for it
+            margin = self.razorMargins[depth]
+            if (turnWhite and staticEval + margin < alpha) or (not turnWhite and staticEval - margin > beta):
+                score = self.quiecenceSearch(gs, alpha, beta, turnWhite, self.qDepthLimit)
+                if depth == 1 or (turnWhite and score < alpha) or (not turnWhite and score > beta):
+                    self.pruneCounts['razoring'] += 1
+                    return score
         return None
 
-    findMoveMinMaxABPruning(gs, validMoves, DEPTH, -CHECKMATE, CHECKMATE, gs.whiteToMove)
-    if nextMove is None and validMoves:
-        # print("MinMaxAI: nextMove was None after search, choosing random move.")
-        nextMove = findRandomMove(validMoves)
-
-    return nextMove
+    def futilityScore(self, depth, alpha, beta, turnWhite, staticEval):
+        # The best a quiet move can hope for here, if even that cannot improve alpha (beta for Black); else None
+        if not self.useFutilityPruning or depth >= len(self.futilityMargins):
+            return None
+        margin = self.futilityMargins[depth]
+        if turnWhite and staticEval + margin <= alpha:
+            return staticEval + margin
+        if not turnWhite and staticEval - margin >= beta:
+            return staticEval - margin
+        return None
 
-def quiecenceSearch(gs, alpha, beta, turnWhite, qDepthRemain):
-    # If there is no more capture/tactic
-    standPatScore = scoreBoard(gs)
+    def nullMoveSearch(self, gs, depth, alpha, beta, turnWhite):
+        # Let the opponent move twice. If a reduced search still fails high for the side to move, a real move
+        # would too, so the bound is returned; None means search the node normally. The caller skips it in
+        # check, where passing is illegal; it is also skipped in the endgame, where zugzwang can make passing
+        # better than every real move.
+        if getGamePhase(gs) == 'end':
+            return None
+        reduction = NULL_MOVE_R_DEEP if depth >= NULL_MOVE_DEEP_DEPTH else NULL_MOVE_R
+        nullDepth = max(depth - 1 - reduction, 0)
+        gs.makeNullMove()
+        if turnWhite:
+            score = self.findMoveMinMaxABPruning(gs, None, nullDepth, beta - 1, beta, False, allowNull=False)
+        else:
+            score = self.findMoveMinMaxABPruning(gs, None, nullDepth, alpha, alpha + 1, True, allowNull=False)
+        gs.undoNullMove()
 
-    if turnWhite:
-        if standPatScore >= beta:
+        if turnWhite and score >= beta:
+            self.pruneCounts['nullMove'] += 1
             return beta
-        alpha = max(alpha, standPatScore)
-    else:
-        if standPatScore <= alpha:
+        if not turnWhite and score <= alpha:
+            self.pruneCounts['nullMove'] += 1
             return alpha
-        beta = min(beta, standPatScore)
-
-    if qDepthRemain == 0:
-        return standPatScore
-
-    allLegalMoves = gs.getValidMoves()
-    captureMoves = []
-
-    for move in allLegalMoves:
-        if move.pieceCaptured != '--':
-            captureMoves.append(move)
-
-    if not captureMoves and not gs.inCheck:
-        return standPatScore
-
-    if turnWhite:
-        maxEval = standPatScore
-        for move in captureMoves:
-            gs.makeMove(move)
-            score = quiecenceSearch(gs, alpha, beta, False, qDepthRemain - 1)
-            gs.undoMove()
-            maxEval = max(maxEval, score)
-            alpha = max(alpha, maxEval)
-
-            if alpha >= beta:
-                break
-
-        return maxEval
-    else:
-        minEval = standPatScore
-        for move in captureMoves:
-            gs.makeMove(move)
-            score = quiecenceSearch(gs, alpha, beta, True, qDepthRemain - 1)
-            gs.undoMove()
-            minEval = min(minEval, score)
-            beta = min(beta, minEval)
-            if alpha >= beta:
-                break
-
-        return minEval
+        return None
 
+    def noMovesScore(self, gs):
+        # The node generated no legal move, so gs.inCheck is still the one its own generation set
+        if not gs.inCheck:
+            return STALEMATE
+        return -CHECKMATE if gs.whiteToMove else CHECKMATE
+
+    def quiecenceSearch(self, gs, alpha, beta, turnWhite, qDepthRemain):
+        self.countNode()
+        if gs.isDrawByRule():
+            return STALEMATE
+        alphaOrig, betaOrig = alpha, beta
+        ttScore, ttMoveID = self.probeTranspositionTable(gs, TT_QDEPTH, alpha, beta)
+        if ttScore is not None:
+            return ttScore
+
+        if gs.isInCheck():
+            # No standing pat while in check: every evasion is searched, and having none is mate
+            captureMoves = gs.getEvasionMoves()
+            if not captureMoves:
+                return -CHECKMATE if gs.whiteToMove else CHECKMATE
+            if qDepthRemain == 0:
+                return scoreBoard(gs)
+            standPatScore = -CHECKMATE - 1 if turnWhite else CHECKMATE + 1
+            pruneLosing = False
+            deltaScore = None
+        else:
+            # Material and piece squares first: the mobility terms are only computed if the bounds leave it open
+            lazyScore = scoreMaterial(gs) + evaluatePiecePositions(gs)
+            boundScore = self.lazyBounds(gs, lazyScore, alpha, beta, turnWhite)
+            if boundScore is not None:
+                return boundScore
+            # If there is no more capture/tactic
+            standPatScore = lazyScore + scoreMobility(gs)
+
+            if turnWhite:
+                if standPatScore >= beta:
+                    self.storeTranspositionTable(gs, TT_QDEPTH, beta, alphaOrig, betaOrig, None)
+                    return beta
+                alpha = max(alpha, standPatScore)
+            else:
+                if standPatScore <= alpha:
+                    self.storeTranspositionTable(gs, TT_QDEPTH, alpha, alphaOrig, betaOrig, None)
+                    return alpha
+                beta = min(beta, standPatScore)
+
+            if qDepthRemain == 0:
+                return standPatScore
+
+            captureMoves = gs.getCaptureMoves()  # legal captures and promotions only
+            if not captureMoves:
+                self.storeTranspositionTable(gs, TT_QDEPTH, standPatScore, alphaOrig, betaOrig, None)
+                return standPatScore
+            pruneLosing = self.useSeePruning  # standing pat is always at least as good as losing material
+            # A capture is skipped when even its victim plus DELTA_MARGIN cannot reach alpha (beta for Black)
+            deltaScore = standPatScore + (DELTA_MARGIN if turnWhite else -DELTA_MARGIN) \
+                if self.useDeltaPruning else None
+
+        putMoveFirst(captureMoves, ttMoveID)
+        bestMove = None
+        if turnWhite:
+            maxEval = standPatScore
+            for move in captureMoves:
+                if deltaScore is not None and deltaScore + captureGain(move) <= alpha:
+                    self.pruneCounts['deltaCapture'] += 1
+                    continue
+                if pruneLosing and gs.isLosingCapture(move):
+                    self.pruneCounts['losingCapture'] += 1
+                    continue
+                gs.makeMove(move)
+                score = self.quiecenceSearch(gs, alpha, beta, False, qDepthRemain - 1)
+                gs.undoMove()
+                if score > maxEval:
+                    maxEval = score
+                    bestMove = move
+                alpha = max(alpha, maxEval)
+
+                if alpha >= beta:
+                    break
 
+            self.storeTranspositionTable(gs, TT_QDEPTH, maxEval, alphaOrig, betaOrig, bestMove)
+            return maxEval
+        else:
+            minEval = standPatScore
+            for move in captureMoves:
+                if deltaScore is not None and deltaScore - captureGain(move) >= beta:
+                    self.pruneCounts['deltaCapture'] += 1
+                    continue
+                if pruneLosing and gs.isLosingCapture(move):
+                    self.pruneCounts['losingCapture'] += 1
+                    continue
+                gs.makeMove(move)
+                score = self.quiecenceSearch(gs, alpha, beta, True, qDepthRemain - 1)
+                gs.undoMove()
+                if score < minEval:
+                    minEval = score
+                    bestMove = move
+                beta = min(beta, minEval)
+                if alpha >= beta:
+                    break
 
+            self.storeTranspositionTable(gs, TT_QDEPTH, minEval, alphaOrig, betaOrig, bestMove)
+            return minEval
+
+    def lazyBounds(self, gs, lazyScore, alpha, beta, turnWhite):
+        # Quiescence cutoffs decided from material + piece squares (lazyScore), with LAZY_EVAL_MARGIN standing in
+        # for the mobility terms. Returns the fail-hard bound, or None when the full stand pat is needed.
+        if turnWhite:
+            if self.useLazyEval and lazyScore - LAZY_EVAL_MARGIN >= beta:
+                self.pruneCounts['lazyEval'] += 1
+                return beta
+            if self.useDeltaPruning and \
+                    lazyScore + LAZY_EVAL_MARGIN + maxCaptureGain(gs, True) + DELTA_MARGIN <= alpha:
+                self.pruneCounts['deltaNode'] += 1  # not even the best capture on the board reaches alpha
+                return alpha
+        else:
+            if self.useLazyEval and lazyScore + LAZY_EVAL_MARGIN <= alpha:
+                self.pruneCounts['lazyEval'] += 1
+                return alpha
+            if self.useDeltaPruning and \
+                    lazyScore - LAZY_EVAL_MARGIN - maxCaptureGain(gs, False) - DELTA_MARGIN >= beta:
+                self.pruneCounts['deltaNode'] += 1
+                return beta
+        return None
 
+    def moveOrder(self, gs, validMoves, ply, bestMoveID=None, previousMove=None):
+        # Scores every move once and hands them out best first (ChessEngine.pickBest); validMoves is not changed
+        killerMoves = self.killerMoves
+        mvvLvaTable = ChessEngine.MVV_LVA_TABLE
+        scoreQuiet = self.quietScorer(previousMove)
+
+        moves = list(validMoves)
+        scores = []
+        for move in moves:
+            moveScoreGuess = 0
+
+            if bestMoveID is not None and move.moveID == bestMoveID:
+                moveScoreGuess += HASH_MOVE_BONUS
+            if 0 <= ply < MAX_PLY:
+                if killerMoves[ply][0] is not None and move == killerMoves[ply][0]:
+                    moveScoreGuess += KILLER_MOVE_BONUS_1
+                elif killerMoves[ply][1] is not None and move == killerMoves[ply][1]:
+                    moveScoreGuess += KILLER_MOVE_BONUS_2
+            if move.pieceCaptured != '--': # Capture
+                exchangeLoss = gs.exchangeLoss(move)
+                if exchangeLoss < 0:  # SEE: the exchange loses material, so it ranks with the quiet moves
+                    moveScoreGuess += exchangeLoss
+                else:  # MVV-LVA estimate
+                    moveScoreGuess += MVV_LVA_SCALE * mvvLvaTable[move.pieceCaptured[1]][move.pieceMoved[1]]
+            if move.isPawnPromotion:
+                moveScoreGuess += pieceScore['Q'] # Assuming promotion to Queen
+
+            if gs.givesCheck(move):
+                moveScoreGuess += CHECK_BONUS
+
+            # 5. History Heuristic, continuation history and countermove
+            moveScoreGuess += scoreQuiet(move)
+
+            scores.append(moveScoreGuess)
+
+        return ChessEngine.pickBest(moves, scores)
+
+
+defaultSearcher = None
+
+
+def findBestMoveMinMax(gs, validMoves, maxDepth=DEPTH, softTimeLimit=None, hardTimeLimit=None,
+                       nodeLimit=None):
+    # Kept for existing callers; runs on one shared Searcher. New code should own a Searcher per game.
+    global defaultSearcher
+    if defaultSearcher is None:
+        defaultSearcher = Searcher()
+    return defaultSearcher.findBestMove(gs, validMoves, maxDepth, softTimeLimit, hardTimeLimit, nodeLimit)
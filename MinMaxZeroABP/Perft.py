@@ -0,0 +1,96 @@
+# Perft.py - headless move generator check and speed benchmark
+#
+#   python Perft.py 4                       perft(1..4) from the start position
+#   python Perft.py 3 --divide              node count under every root move
+#   python Perft.py 3 --moves e2e4 e7e5     start from the position after these moves
+#   python Perft.py 3 --fen "<fen>"         start from a FEN position
+#   python Perft.py 3 --fen "<fen>" --expect 48 2039 97862    and check its counts for depth 1, 2, 3
+#
+# Every number here is produced by getValidMoves/makeMove/undoMove only, so it is the baseline for
+# engine speed changes: a change that alters a node count is a move generation bug.
+
+import argparse
+import time
+
+import ChessEngine
+
+
+def moveToText(move):
+    return move.getRankFile(move.startRow, move.startCol) + move.getRankFile(move.endRow, move.endCol)
+
+
+def findMove(gs, text):
+    # Coordinate notation such as e2e4 (a trailing promotion letter is accepted, promotions are queens)
+    for move in gs.getValidMoves():
+        if moveToText(move) == text[:4]:
+            return move
+    raise ValueError(f"'{text}' is not a legal move in this position")
+
+
+def divide(gs, depth):
+    # Returns [(moveText, nodes)] for every root move, each counted with ChessEngine.perft
+    results = []
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((moveToText(move), ChessEngine.perft(gs, depth - 1)))
+        gs.undoMove()
+    return results
+
+
+def runPerft(gs, depth, showDivide=False, reference=None):
+    # Prints nodes, time and nodes/s for every depth up to `depth`; returns False on a reference mismatch
+    allMatch = True
+    for d in range(1, depth + 1):
+        startTime = time.perf_counter()
+        if showDivide and d == depth:
+            results = divide(gs, d)
+            nodes = sum(count for _, count in results)
+        else:
+            nodes = ChessEngine.perft(gs, d)
+        elapsed = time.perf_counter() - startTime
+
+        if showDivide and d == depth:
+            for text, count in sorted(results):
+                print(f"  {text}: {count}")
+        status = ""
+        if reference is not None and d < len(reference):
+            ok = nodes == reference[d]
+            allMatch = allMatch and ok
+            status = "  OK" if ok else f"  MISMATCH (expected {reference[d]})"
+        nps = nodes / elapsed if elapsed > 0 else 0
+        print(f"perft({d}) = {nodes:>10}  {elapsed:8.3f}s  {nps:10.0f} nodes/s{status}")
+    return allMatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count legal move tree leaves (perft) and time them.")
+    parser.add_argument('depth', type=int, nargs='?', default=4)
+    parser.add_argument('--fen', help="start from this position instead of the initial one")
+    parser.add_argument('--moves', nargs='*', default=[], help="moves to play first, e.g. e2e4 e7e5")
+    parser.add_argument('--divide', action='store_true', help="print the node count below each root move")
+    parser.add_argument('--expect', nargs='+', type=int, metavar='NODES',
+                        help="known perft counts of the position for depth 1, 2, ... to check against")
+    args = parser.parse_args()
+
+    try:
+        gs = ChessEngine.newGameState(args.fen)
+    except ValueError as error:
+        parser.error(str(error))
+    for text in args.moves:
+        try:
+            gs.makeMove(findMove(gs, text))
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.expect:
+        reference = [1] + args.expect
+    elif args.moves or args.fen not in (None, ChessEngine.START_FEN):
+        reference = None
+    else:
+        reference = ChessEngine.STARTPOS_PERFT
+    allMatch = runPerft(gs, args.depth, args.divide, reference)
+    raise SystemExit(0 if allMatch else 1)
+
+
+if __name__ == '__main__':
+    main()
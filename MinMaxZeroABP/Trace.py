@@ -0,0 +1,36 @@
+# Trace.py - switchable debug output for the engine
+#
+# Hot paths guard every trace with a plain level check, so when a category is off nothing is
+# formatted and nothing is written:
+#
+#     if Trace.levels['move'] >= Trace.DEBUG:
+#         Trace.emit('move', f"makeMove: {move.getChessNotation(self)}")
+
+import sys
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+
+# move:  every makeMove (very noisy inside a search)
+# king:  king moves rejected because the destination is attacked
+# draw:  why getValidMoves declared a stalemate/draw
+# search: the searcher's depth, node and pruning report after every AI move
+levels = {'move': OFF, 'king': OFF, 'draw': OFF, 'search': OFF}
+output = sys.stdout
+
+
+def enable(category, level=DEBUG):
+    if category not in levels:
+        raise ValueError(f"Unknown trace category '{category}', expected one of {sorted(levels)}")
+    levels[category] = level
+
+
+def disable(category=None):
+    # Without a category every category is switched off
+    for name in ([category] if category else list(levels)):
+        enable(name, OFF)
+
+
+def emit(category, message):
+    print(f"[{category}] {message}", file=output)
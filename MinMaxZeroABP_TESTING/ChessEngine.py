@@ -1,3 +1,6 @@
+import Trace
+
+
 class GameState():
     def __init__(self):
         # 8x8 board, 2d list with 2 letter element in it representing color and type
@@ -138,11 +141,11 @@ class GameState():
         return self.halfmoveClock >= 100
 
     def makeMove(self, move):
-        print(f"This is the color that is making move:{self.whiteToMove}")
-        print(f"DEBUG makeMove: Called for {move.getChessNotation(self)}. Current player was {'White' if self.whiteToMove else 'Black'}")
+        if Trace.levels['move'] >= Trace.DEBUG:
+            Trace.emit('move', f"makeMove: {move.getChessNotation(self)} by {'White' if self.whiteToMove else 'Black'}, "
+                               f"{'Black' if self.whiteToMove else 'White'} to move next")
         self.board[move.startRow][move.startCol] = "--"
         self.board[move.endRow][move.endCol] = move.pieceMoved
-        print(f"DEBUG makeMove: Turn flipped. New player is {'White' if self.whiteToMove else 'Black'}")
 
         self.moveLog.append(move)  # History of the game
         self.whiteToMove = not self.whiteToMove  # this should exchange turns
@@ -379,7 +382,8 @@ class GameState():
                 self.checkmate = True
                 self.stalemate = False  # Not stalemate if checkmate
             else:
-                print("No Move stalemate")
+                if Trace.levels['draw'] >= Trace.INFO:
+                    Trace.emit('draw', "No Move stalemate")
                 self.stalemate = True  # Stalemate by no legal moves
                 self.checkmate = False
         else:  # Moves are possible, reset checkmate/stalemate and check other draws
@@ -387,15 +391,18 @@ class GameState():
             self.stalemate = False
             # Check other draw conditions only if not already checkmate/stalemate by no moves
             if self.is_fifty_move_rule():
-                print("50 move stalemate")
+                if Trace.levels['draw'] >= Trace.INFO:
+                    Trace.emit('draw', "50 move stalemate")
                 self.stalemate = True
             elif self.is_threefold_repetition():
-                print("Three fold repetition stalemate")
+                if Trace.levels['draw'] >= Trace.INFO:
+                    Trace.emit('draw', "Three fold repetition stalemate")
                 self.stalemate = True
             elif self.is_insufficient_material():
                 # Important: Insufficient material can occur even if moves are possible.
                 # e.g., K vs K, K can still move but it's a draw.
-                print("Insufficient material stalemate")
+                if Trace.levels['draw'] >= Trace.INFO:
+                    Trace.emit('draw', "Insufficient material stalemate")
                 self.stalemate = True
             else:
                 self.stalemate = False
@@ -613,10 +620,10 @@ class GameState():
                             self.whiteKingLocation = (rows, cols)
                         else:
                             self.blackKingLocation = (rows, cols)
-                            print(
-                            f"DEBUG KingMove: King move from ({rows},{cols}) to ({endRow},{endCol}) for {allyColor} REJECTED.")
-                            print(
-                            f"  Reason: checkForPinsAndChecks (king at {original_king_pos_for_log[0]},{original_king_pos_for_log[1]}) returned inCheck=True.")
+                        if Trace.levels['king'] >= Trace.DEBUG:
+                            Trace.emit('king', f"King move from ({rows},{cols}) to ({endRow},{endCol}) for {allyColor} "
+                                               f"REJECTED: checkForPinsAndChecks (king at {original_king_pos_for_log[0]},"
+                                               f"{original_king_pos_for_log[1]}) returned inCheck=True.")
                     if allyColor == 'w':
                         self.whiteKingLocation = (rows, cols)
                     else: